@@ -14,105 +14,363 @@
 # falls on this path, it means the guard was already hit once when shot in this angle.
 
 
+import threading
+from collections import OrderedDict
+from multiprocessing import Pool
+
 import numpy as np
 
 
-def solution(dimensions, my_pos, guard_pos, distance):
+def solution(dimensions, my_pos, guard_pos, distance, stream=False, workers=None):
+    # Handling the edge case of guard being out of range of the laser to begin with
+    if (guard_pos[0] - my_pos[0])**2 + (guard_pos[1] - my_pos[1])**2 > distance**2:
+        return 0
+
+    # For very large distances, walk the grid ring by ring instead of materializing it
+    if stream:
+        count = 0
+        for count in stream_hits(dimensions, my_pos, guard_pos, distance):
+            pass
+        return count
+
+    # Spread the grid over a process pool, one angular sector per task
+    if workers is not None and workers > 1:
+        return parallel_hits(dimensions, my_pos, guard_pos, distance, workers)
+
+    # Get the offsets from the captain to the reflections of the captain (me) and the guard
+    my_x, my_y, my_distances = image_offsets(dimensions, my_pos, my_pos, distance)
+    guard_x, guard_y, guard_distances = image_offsets(dimensions, my_pos, guard_pos, distance)
+
+    # A shot in a given direction hits whichever reflection lies closest along that direction. The captain's
+    # reflections are the danger bearings and the guard's reflections the target bearings, so we put all of them in
+    # one array and keep only the closest point of every bearing. The answer is the number of bearings whose closest
+    # point is one of the guard's reflections.
+    keys = bearing_keys(np.concatenate((my_x, guard_x)), np.concatenate((my_y, guard_y)), distance)
+    squared_distances = np.concatenate((my_distances, guard_distances))
+    is_guard = np.concatenate((np.zeros(len(my_x), dtype=bool), np.ones(len(guard_x), dtype=bool)))
+
+    _, closest = nearest_by_bearing(keys, squared_distances)
+    return int(np.count_nonzero(is_guard[closest]))
+
+
+# Returns an exact integer key for the bearing of every offset (x, y) from the captain. Two offsets lie on the same
+# bearing exactly when they are positive multiples of the same reduced direction (x/g, y/g), where g = gcd(x, y).
+# Since both components of the reduced direction are within the distance, the pair is packed into a single integer.
+# The gcds can be passed in if they are already known.
+def bearing_keys(x, y, distance, g=None):
+    if g is None:
+        g = np.gcd(x, y)
+    return (x // g)*(2*distance + 1) + y // g
+
+
+# Index from bearing to the closest point along it. Sorting by bearing key and then by squared distance puts the
+# closest point of every bearing first in its group. Returns the sorted, unique bearing keys, along with the
+# position of the closest point of each bearing in the input arrays.
+def nearest_by_bearing(keys, squared_distances):
+    order = np.lexsort((squared_distances, keys))
+    keys = keys[order]
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    return keys[first], order[first]
+
+
+# Method to return the offsets from the captain's original position to every one of the reflections of the given
+# point (the captain or the guard), as flat arrays. We get all the possible X's and all the possible Y's of the grid
+# of mirrored rooms, whose cross product is essentially the entire grid. The captain's own position is dropped, as
+# well as everything out of range of the laser.
+def image_offsets(dimensions, my_pos, point, distance):
+    width_number, height_number = grid_size(dimensions, my_pos, distance)
+    xs = mirrored_coordinates(point[0], dimensions[0], np.arange(-width_number, width_number+1, dtype=np.int64))
+    ys = mirrored_coordinates(point[1], dimensions[1], np.arange(-height_number, height_number+1, dtype=np.int64))
+
+    x, y = np.meshgrid(xs - my_pos[0], ys - my_pos[1])
+    x = x.ravel()
+    y = y.ravel()
+    squared_distances = x*x + y*y
+    in_range = (squared_distances <= distance**2) & (squared_distances > 0)
+    return x[in_range], y[in_range], squared_distances[in_range]
+
+
+# Calculate size of grid. This is done by making sure the total width or total height of all the mirror worlds
+# minus the the original width or height of the captain's position (since the radius is from the captain) should
+# exceed the radius of impact.
+def grid_size(dimensions, my_pos, distance):
     w = dimensions[0]
     h = dimensions[1]
+    estimated_width_number = int(np.ceil(distance/float(w)))
+    estimated_height_number = int(np.ceil(distance/float(h)))
+    width_number = estimated_width_number if estimated_width_number*w - my_pos[0] >= distance else estimated_width_number+1
+    height_number = estimated_height_number if estimated_height_number*h - my_pos[1] >= distance else estimated_height_number+1
+    return width_number, height_number
 
-    # Utility method for distance between points
-    def distance_between_points(p, q):
-        dstnc = np.sqrt((q[1] - p[1])**2 + (q[0] - p[0])**2)
-        return dstnc
 
-    # Handling the edge case of guard being out of range of the laser to begin with
-    if distance_between_points(my_pos, guard_pos) > distance:
+# From simple observation of a how coordinates mirror in a 3x3 grid, we can derive the following equations
+# for coordinates of mirrored points in any given mirrored room in the grid. Returns the coordinate of the point
+# along one axis (of the given room size) in each of the given rooms along that axis.
+def mirrored_coordinates(coordinate, size, rooms):
+    # Even rooms contain a translated copy of the point, odd rooms a reflected one
+    return np.where(rooms % 2 == 0, rooms*size + coordinate, rooms*size + (size - coordinate))
+
+
+# Streaming version of the solution for distances much larger than the room. Rather than materializing the whole
+# grid, the rooms are visited in concentric square rings around the original room, and only the guard's reflections
+# of a few rings are held in memory at a time. A reflection at the offset g*(a, b) from the captain, where g = gcd of
+# the offset, hits the guard unless some t*(a, b) with 0 < t < g is a reflection of the captain or the guard, since
+# all of the coordinates are integers. Whether there is such a t is worked out arithmetically (see first_multiple),
+# so nothing needs to be remembered between rings. Rings are checked together in chunks of about chunk_rooms rooms,
+# which bounds the memory. Yields the running count of hits after every ring.
+def stream_hits(dimensions, my_pos, guard_pos, distance, chunk_rooms=2**16):
+    width_number, height_number = grid_size(dimensions, my_pos, distance)
+    count = 0
+
+    chunk = list()
+    for ring in range(max(width_number, height_number) + 1):
+        chunk.append(ring_rooms(ring, width_number, height_number))
+        if ring < max(width_number, height_number) and sum(len(n) for n, _ in chunk) < chunk_rooms:
+            continue
+
+        n = np.concatenate([n for n, _ in chunk])
+        m = np.concatenate([m for _, m in chunk])
+        rings = np.repeat(np.arange(len(chunk)), [len(n) for n, _ in chunk])
+        hits = unblocked_reflections(dimensions, my_pos, guard_pos, distance, n, m)
+        for ring_count in np.bincount(rings[hits], minlength=len(chunk)).tolist():
+            count += ring_count
+            yield count
+        chunk = list()
+
+
+# Returns, for the guard's reflection in every one of the given rooms, whether it is within range and not preceded
+# on its bearing by a reflection of the captain or the guard.
+def unblocked_reflections(dimensions, my_pos, guard_pos, distance, n, m):
+    w = dimensions[0]
+    h = dimensions[1]
+    x = mirrored_coordinates(guard_pos[0], w, n) - my_pos[0]
+    y = mirrored_coordinates(guard_pos[1], h, m) - my_pos[1]
+    hits = x*x + y*y <= distance**2
+
+    # Points with g = 1 can't be preceded by anything on their bearing
+    g = np.gcd(x, y)
+    shared = np.flatnonzero(hits & (g > 1))
+    a = x[shared] // g[shared]
+    b = y[shared] // g[shared]
+    for point in (my_pos, guard_pos):
+        for sign_x in (1, -1):
+            for sign_y in (1, -1):
+                t = first_multiple(a, sign_x*point[0] - my_pos[0], 2*w, b, sign_y*point[1] - my_pos[1], 2*h)
+                hits[shared[t < g[shared]]] = False
+    return hits
+
+
+# The reflections of a point at x along an axis of room size w are at exactly the coordinates congruent to x or -x
+# modulo 2*w. Hence t*(a, b) is one of the reflections if, for one of the choices of signs, t*a is congruent to
+# r_x = +-x - my_x modulo 2*w and t*b to r_y = +-y - my_y modulo 2*h. Returns the smallest t > 0 satisfying both
+# congruences for every (a, b), or the largest int64 if there is none.
+def first_multiple(a, r_x, modulus_x, b, r_y, modulus_y):
+    t_x, period_x, solvable_x = solve_congruence(a, r_x, modulus_x)
+    t_y, period_y, solvable_y = solve_congruence(b, r_y, modulus_y)
+
+    # Chinese remainder theorem for t = t_x (mod period_x) and t = t_y (mod period_y)
+    d = np.gcd(period_x, period_y)
+    solvable = solvable_x & solvable_y & ((t_y - t_x) % d == 0)
+    reduced_period_y = period_y // d
+    k = ((t_y - t_x) // d % reduced_period_y)*modular_inverse(period_x // d, reduced_period_y) % reduced_period_y
+    period = period_x*reduced_period_y
+    t = (t_x + period_x*k) % period
+    t = np.where(t == 0, period, t)
+    return np.where(solvable, t, np.iinfo(np.int64).max)
+
+
+# Solves t*a = r (mod modulus) for every a. Returns the smallest solution t >= 0, the period of the solutions,
+# and whether there is any solution at all.
+def solve_congruence(a, r, modulus):
+    a = a % modulus
+    d = np.gcd(a, modulus)
+    solvable = (r % modulus) % d == 0
+    period = modulus // d
+    t = ((r % modulus) // d % period)*modular_inverse(a // d % period, period) % period
+    return t, period, solvable
+
+
+# Inverse of every a modulo the corresponding modulus (coprime to it), by the extended Euclidean algorithm run
+# on all of them at once.
+def modular_inverse(a, modulus):
+    r0, r1 = np.broadcast_arrays(a % modulus, modulus)
+    r0 = r0.copy()
+    r1 = r1.copy()
+    s0 = np.ones(r0.shape, dtype=np.int64)
+    s1 = np.zeros(r0.shape, dtype=np.int64)
+    while np.any(r1 != 0):
+        active = r1 != 0
+        q = np.where(active, r0 // np.where(active, r1, 1), 0)
+        r0, r1 = np.where(active, r1, r0), np.where(active, r0 - q*r1, r1)
+        s0, s1 = np.where(active, s1, s0), np.where(active, s0 - q*s1, s1)
+    return s0 % modulus
+
+
+# Returns the room indices (n, m) of all the rooms in the square ring at the given distance from the original room,
+# i.e. those with max(|n|, |m|) == ring, clipped to the size of the grid.
+def ring_rooms(ring, width_number, height_number):
+    if ring == 0:
+        return np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64)
+
+    ns = list()
+    ms = list()
+    # Top and bottom rows of the ring
+    if ring <= height_number:
+        n = np.arange(-min(ring, width_number), min(ring, width_number)+1, dtype=np.int64)
+        for m in (-ring, ring):
+            ns.append(n)
+            ms.append(np.full(len(n), m, dtype=np.int64))
+    # Left and right columns of the ring, without the corners
+    if ring <= width_number:
+        m = np.arange(-min(ring-1, height_number), min(ring-1, height_number)+1, dtype=np.int64)
+        for n in (-ring, ring):
+            ns.append(np.full(len(m), n, dtype=np.int64))
+            ms.append(m)
+    return np.concatenate(ns), np.concatenate(ms)
+
+
+# Parallel version of the solution. Since bearings are exact directions, the plane around the captain can be split
+# into angular sectors that never share a bearing: the four quadrants, each cut into the same number of slices.
+# Every sector is then solved independently in a process pool and the counts are added up.
+def parallel_hits(dimensions, my_pos, guard_pos, distance, workers):
+    tasks = list()
+    for quadrant in range(4):
+        for slice_index in range(workers):
+            tasks.append((dimensions, my_pos, guard_pos, distance, quadrant, workers, slice_index))
+
+    pool = Pool(workers)
+    try:
+        counts = pool.map(sector_hits, tasks)
+    finally:
+        pool.close()
+        pool.join()
+    return sum(counts)
+
+
+# Solves a single angular sector (given as one task tuple so that it can be mapped over a process pool). The sector is
+# slice number slice_index out of slices in the given quadrant. Quadrant q contains the offsets which, rotated by q
+# right angles clockwise, have a positive x and a non-negative y. The slices split the quadrant at integer directions,
+# so that which slice a point belongs to is decided exactly with cross products. The grid is walked a few columns at
+# a time, only over the rows that can fall in the slice, to keep both the work and the memory of each task
+# proportional to the size of its own sector.
+def sector_hits(task):
+    dimensions, my_pos, guard_pos, distance, quadrant, slices, slice_index = task
+    w = dimensions[0]
+    h = dimensions[1]
+    width_number, height_number = grid_size(dimensions, my_pos, distance)
+    n = np.arange(-width_number, width_number+1, dtype=np.int64)
+    m = np.arange(-height_number, height_number+1, dtype=np.int64)
+
+    # Integer directions bounding the slice, from the x axis to the y axis of the rotated quadrant
+    lower = slice_boundary(slice_index, slices)
+    upper = slice_boundary(slice_index+1, slices)
+
+    points = list()
+    for kind, point in enumerate((my_pos, guard_pos)):
+        xs = mirrored_coordinates(point[0], w, n) - my_pos[0]
+        ys = mirrored_coordinates(point[1], h, m) - my_pos[1]
+        # Rotating every offset (x, y) by a right angle clockwise turns it into (y, -x)
+        for _ in range(quadrant):
+            xs, ys = ys, -xs
+        xs = np.sort(xs[(xs > 0) & (xs <= distance)])
+        ys = np.sort(ys[(ys >= 0) & (ys <= distance)])
+
+        for start in range(0, len(xs), 64):
+            columns = xs[start:start+64]
+            # Rows between the lower boundary at the first column and the upper boundary at the last column
+            first = np.searchsorted(ys, columns[0]*lower[1] // lower[0])
+            last = len(ys) if upper[0] == 0 else np.searchsorted(ys, -(-columns[-1]*upper[1] // upper[0]), side="right")
+            x, y = np.meshgrid(columns, ys[first:last])
+            x = x.ravel()
+            y = y.ravel()
+            squared_distances = x*x + y*y
+            in_sector = (squared_distances <= distance**2) & (lower[0]*y - lower[1]*x >= 0)
+            if upper[0] != 0:
+                in_sector &= upper[0]*y - upper[1]*x < 0
+            points.append((x[in_sector], y[in_sector], squared_distances[in_sector],
+                           np.full(np.count_nonzero(in_sector), kind == 1, dtype=bool)))
+    if not points:
         return 0
 
-    # Method to generate the grid of mirrored rooms and coordinates of captain and guard within these mirror worlds
-    def grow_grid():
-
-        # Calculate size of grid. This is done by making sure the total width or total height of all the mirror worlds
-        # minus the the original width or height of the captain's position (since the radius is from the captain) should
-        # exceed the radius of impact.
-        estimated_width_number = int(np.ceil(distance/float(w)))
-        estimated_height_number = int(np.ceil(distance/float(h)))
-        width_number = estimated_width_number if estimated_width_number*w - my_pos[0] >= distance else estimated_width_number+1
-        height_number = estimated_height_number if estimated_height_number*h - my_pos[1] >= distance else estimated_height_number+1
-
-        # Use the dimensions of the grid of rooms to get the coordinates of captain and guard in each room
-        return get_mirrored_points(my_pos, width_number, height_number), get_mirrored_points(guard_pos, width_number, height_number)
-
-    # Method to return coordinates of captain and guard in all the room (original + mirrored)
-    # From simple observation of a how coordinates mirror in a 3x3 grid, we can derive the following equations
-    # for coordinates of mirrored points in any given mirrored room in the grid. We return a list of all the possible
-    # X's and all the possible Y's, whose cross product is essentially the entire grid.
-    def get_mirrored_points(point, width_number, height_number):
-        bearings = dict()
-        xs = list()
-        ys = list()
-        x1 = point[0]
-        y1 = point[1]
-        # Calculate bearings
-        for n in range(-width_number, width_number+1):
-            if n == 0:
-                x_pos = x1
-            elif n % 2 == 1:
-                x_pos = n*w + (w - x1)
-            elif n % 2 == 0:
-                x_pos = n*w + x1
-            xs.append(x_pos)
-
-        for m in range(-height_number, height_number+1):
-            if m == 0:
-                y_pos = y1
-            elif m % 2 == 1:
-                y_pos = m*h + (h - y1)
-            elif m % 2 == 0:
-                y_pos = m*h + y1
-            ys.append(y_pos)
-
-        bearings["X"] = xs
-        bearings["Y"] = ys
-        return bearings
-
-    # Get the coordinates (bearings) of the captain (me) and the guard
-    my_bearings, guard_bearings = grow_grid()
-
-    # To verify each of the guards coordinates, whether it is a valid direction to shoot or not, we employ the following
-    # logic. We first calculate all the angles to each of the captain's reflections and the distance to the reflection,
-    # which tells us the angle and distance at which the captain might get shot (let's call these danger angles).
-    # We save these in a dictionary.
-    # Then we calculate the angle and distance from the captain's original position to each of the guard's positions
-    # one by one. If the distance is within the range of the laser, we check the dictionary to see if this angle matches
-    # any of the captain's danger angles. If it is a danger angle, we check to see if the distance of captain getting shot
-    # is less than the distance of guard getting shot (i.e. will the laser reach the captain first or the guard first.)
-    # If it is not a danger angle or even if it is, if the distance of guard getting shot is less than the captain, i.e.
-    # if the guard gets shot first, then it is safe to shoot in this angle. We add this angle to valid angles list.
-    # We also add this angle and distance to our dictionary, so that for the next guard's position, we now check against
-    # all of the captains positions, as well as for any duplicates with previously verified guard's angles. This is to make
-    # sure guard is not already hit in a particular angle, and we don't end up hitting him twice.
-    # Finally we return the length of all the valid angles.
-    angle_distance_map = dict()
-    valid_angles = set()
-
-    for x in my_bearings["X"]:
-        for y in my_bearings["Y"]:
-            dist = distance_between_points(my_pos, [x, y])
-            if [x, y] != my_pos and dist <= distance:
-                angle = np.arctan2(my_pos[1]-y, my_pos[0]-x)
-                if angle not in angle_distance_map or (angle in angle_distance_map and angle_distance_map[angle] > dist):
-                    angle_distance_map[angle] = dist
-
-    for x in guard_bearings["X"]:
-        for y in guard_bearings["Y"]:
-            dist = distance_between_points(my_pos, [x, y])
-            if dist <= distance:
-                angle = np.arctan2(my_pos[1]-y, my_pos[0]-x)
-                if angle not in angle_distance_map or (angle in angle_distance_map and angle_distance_map[angle] > dist):
-                    angle_distance_map[angle] = dist
-                    if angle not in valid_angles:
-                        valid_angles.add(angle)
-
-    return len(valid_angles)
+    x = np.concatenate([p[0] for p in points])
+    y = np.concatenate([p[1] for p in points])
+    squared_distances = np.concatenate([p[2] for p in points])
+    is_guard = np.concatenate([p[3] for p in points])
+    _, closest = nearest_by_bearing(bearing_keys(x, y, distance), squared_distances)
+    return int(np.count_nonzero(is_guard[closest]))
+
+
+# Integer direction at the given fraction of a right angle, starting from the x axis. The first and last
+# boundaries are exactly the x and y axes.
+def slice_boundary(index, slices, scale=2**20):
+    if index == 0:
+        return 1, 0
+    if index == slices:
+        return 0, 1
+    angle = np.pi/2*index/slices
+    return int(round(scale*np.cos(angle))), int(round(scale*np.sin(angle)))
+
+
+# Room for answering many queries with the same room dimensions and captain's position, where only the guard's
+# position and the distance change. The captain's reflections do not depend on the guard, so they are computed once,
+# as an index from bearing to the closest of the captain's reflections along it (the blocking distance). A query then
+# only generates the guard's reflections, keeps the closest one of every bearing and checks it against the index.
+# The index is built for the largest distance asked so far; it stays valid for every smaller distance, since a
+# reflection of the captain can only block a guard's reflection that is closer still.
+class Room:
+    def __init__(self, dimensions, my_pos, distance=0):
+        self.dimensions = dimensions
+        self.my_pos = my_pos
+        self.distance = -1
+        self.lock = threading.Lock()
+        self.extend(distance)
+
+    # Rebuilds the index of the captain's reflections if the distance exceeds the one it was built for.
+    # Returns the index, as the distance it was built for, the sorted keys and the blocking distances.
+    def extend(self, distance):
+        with self.lock:
+            if distance > self.distance:
+                x, y, squared_distances = image_offsets(self.dimensions, self.my_pos, self.my_pos, distance)
+                self.keys, closest = nearest_by_bearing(bearing_keys(x, y, distance), squared_distances)
+                self.blocking_distances = squared_distances[closest]
+                self.distance = distance
+            return self.distance, self.keys, self.blocking_distances
+
+    def solution(self, guard_pos, distance):
+        my_pos = self.my_pos
+        if (guard_pos[0] - my_pos[0])**2 + (guard_pos[1] - my_pos[1])**2 > distance**2:
+            return 0
+        index_distance, index_keys, blocking_distances = self.extend(distance)
+
+        # Keys must use the same packing as the index, i.e. the distance it was built for
+        x, y, squared_distances = image_offsets(self.dimensions, my_pos, guard_pos, distance)
+        keys, closest = nearest_by_bearing(bearing_keys(x, y, index_distance), squared_distances)
+        squared_distances = squared_distances[closest]
+
+        # Look up every bearing in the sorted index of the captain's reflections
+        if len(index_keys) == 0:
+            return len(keys)
+        positions = np.minimum(np.searchsorted(index_keys, keys), len(index_keys) - 1)
+        blocked = (index_keys[positions] == keys) & (blocking_distances[positions] < squared_distances)
+        return int(len(keys) - np.count_nonzero(blocked))
+
+
+# Global cache of the most recently used rooms, keyed by the room dimensions and the captain's position. Every room
+# holds an index whose size grows with the square of the largest distance asked, so only a few are kept.
+rooms = OrderedDict()
+rooms_size = 8
+rooms_lock = threading.Lock()
+
+
+# Returns the room for the given dimensions and captain's position, creating it on first use
+def get_room(dimensions, my_pos):
+    key = (tuple(dimensions), tuple(my_pos))
+    with rooms_lock:
+        room = rooms.pop(key, None)
+        if room is None:
+            room = Room(dimensions, my_pos)
+        rooms[key] = room
+        while len(rooms) > rooms_size:
+            rooms.popitem(last=False)
+    return room
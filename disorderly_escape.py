@@ -12,100 +12,167 @@
 # values and divide by the total number of symmetries, which is all possible row and column swappings. This gives us
 # the count of unique configurations by grouping.
 
-from math import factorial
-from fractions import gcd
-
-
-def solution(w, h, s):
-
-    partitions = list()
-    for lists in get_partitions(w, h):
-        to_add = list()
-        for lst in lists:
-            to_add.append(Partition(lst, get_cycles(lst)))
-        partitions.append(to_add)
-
-    summation = 0
-    total_row_column_permutations = factorial(w)*(factorial(h))
-
-    for parts_of_columns in partitions[0]:
-        for parts_of_rows in partitions[1]:
-            prod = 1
-            for col_part_idx in range(0, len(parts_of_columns.part)):
-                col_part_cycles = parts_of_columns.part[col_part_idx]
-                if col_part_cycles != 0:
-                    for row_part_idx in range(0, len(parts_of_rows.part)):
-                        row_part_cycles = parts_of_rows.part[row_part_idx]
-                        if row_part_cycles != 0:
-                            prod = prod*((s**(gcd(col_part_idx+1, row_part_idx+1)))**(col_part_cycles*row_part_cycles))
-
-            prod = prod*(total_row_column_permutations/(parts_of_columns.perms*parts_of_rows.perms))
-
-            summation = summation + prod
-
-    return str(summation/total_row_column_permutations)
-
-
-def get_partitions(w, h):
-    partitions = list()
-
-    identity_part = list()
-    identity_part.append(list([1]))
-    partitions.append(identity_part)
-
-    lim = max(w, h)
-    for part_num in range(2, lim+1):
-        for i in range(1, part_num):
-                curr_parts = list()
-                for max_part in range(min(i, part_num-i), 0, -1):
-                    base = (part_num-i)*(part_num-i-1)/2-1
-                    parts = partitions[base + max_part]
-                    for part in parts:
-                        new_part = list(part)
-                        while len(new_part) < i:
-                            new_part.append(0);
-
-                        new_part[i-1] = new_part[i-1]+1
-                        curr_parts.append(new_part)
-                partitions.append(curr_parts)
-
-        parts = list()
-        part = list()
-        while len(part) < part_num-1:
-            part.append(0)
-
-        part.append(1)
-        parts.append(part)
-        partitions.append(parts)
-
-    col_parts = list()  # width wise
-    row_parts = list()  # height wise
-
-    base = w*(w-1)/2
-    for i in range(0, w):
-        col_parts.extend(partitions[base+i])
-
-    if h == w:
-        row_parts = col_parts
+# The partitions of the number of columns (and rows) are generated lazily as tuples of multiplicities, where
+# the i-th entry is the number of cycles of length i + 1, along with the number of permutations with that cycle
+# type (the size of the conjugacy class). For n items, with m_i cycles of length i, this is
+#               n! / (1^m_1 * m_1! * 2^m_2 * m_2! * ...)
+# Every permutation of a conjugacy class contributes the same term to the sum, so the term is counted once per
+# class and weighted by its size. The partitions are cached once generated, so that the same sizes aren't
+# partitioned again on the next call.
+
+from math import factorial, gcd
+from multiprocessing import Pool
+
+import numpy as np
+
+
+def solution(w, h, s, workers=None):
+    return solution_many(w, h, [s], workers=workers)[0]
+
+
+# Solves the same grid for every number of states in the given list. The cycle index of the grid is computed once,
+# and is then evaluated for all of the numbers of states together. With a modulus, the counts are returned modulo it
+# instead, which keeps the evaluation to small integers for huge counts. The modulus has to be coprime to the
+# denominator of the cycle index, which divides w!*h!, so any prime larger than both w and h works.
+def solution_many(w, h, states, modulus=None, workers=None):
+    coefficients, denominator = cycle_index(w, h, workers)
+
+    # Horner's rule over the coefficients, from the highest exponent down, for all the numbers of states at once
+    values = [0]*len(states)
+    for coefficient in reversed(coefficients):
+        values = [value*s + coefficient for value, s in zip(values, states)]
+        if modulus is not None:
+            values = [value % modulus for value in values]
+
+    if modulus is None:
+        return [str(value//denominator) for value in values]
+    inverse = pow(denominator, -1, modulus)
+    return [str(value*inverse % modulus) for value in values]
+
+
+# Cache of the cycle index of every grid computed so far, keyed by the sorted grid size.
+cycle_index_cache = dict()
+
+
+# Returns the cycle index of the grid as a polynomial in the number of states: the list of integer coefficients of
+# every power of it, from 0 up to w*h, along with a common denominator. For a pair of a column and a row conjugacy
+# class, the cells of the grid fall into sum(gcd(i, j)*m_i*n_j) cycles, where the columns have m_i cycles of
+# length i and the rows n_j cycles of length j, so the pair adds the product of the class sizes to the coefficient
+# of that power. The coefficients and the denominator w!*h! are then reduced by their greatest common divisor.
+# The column classes can be split into ranges over a process pool, whose coefficients are then added up exactly.
+def cycle_index(w, h, workers=None, ranges_per_worker=4):
+    key = (min(w, h), max(w, h))
+    if key in cycle_index_cache:
+        return cycle_index_cache[key]
+
+    if workers is not None and workers > 1:
+        column_count = len(list(partitions(w)))
+        range_count = min(workers*ranges_per_worker, column_count)
+        bounds = [column_count*k//range_count for k in range(range_count + 1)]
+        with Pool(workers) as pool:
+            partial_sums = pool.map(range_coefficients, [(w, h, bounds[k], bounds[k+1]) for k in range(range_count)])
+        coefficients = [sum(partial[exponent] for partial in partial_sums) for exponent in range(w*h + 1)]
     else:
-        row_parts = list()
-        base = h*(h-1)/2
-        for i in range(0, h):
-            row_parts.extend(partitions[base+i])
-
-    return [col_parts, row_parts]
-
-
-def get_cycles(part):
-    count = 1
-    for idx in range(1, len(part)+1):
-        permutations = part[idx-1]
-        count = count*(factorial(permutations))
-        count = count*(idx**permutations)
-    return count
-
-
-class Partition:
-    def __init__(self, part, perms):
-        self.part = part
-        self.perms = perms
+        coefficients = range_coefficients((w, h, 0, None))
+
+    denominator = factorial(w)*factorial(h)
+    divisor = denominator
+    for coefficient in coefficients:
+        divisor = gcd(divisor, coefficient)
+    result = ([coefficient//divisor for coefficient in coefficients], denominator//divisor)
+    cycle_index_cache[key] = result
+    return result
+
+
+# Coefficients of the cycle index added up over the column classes in the given range, against every row class.
+# The number of cycles of every pair is a single entry of the product of the column multiplicities, the table of
+# gcd(i, j), and the row multiplicities, which is computed for a block of columns at a time. For every column class,
+# the row class sizes are then summed by the number of cycles, and the sums are multiplied by the column class
+# sizes and added up over the block. The class sizes are too large for machine integers, so the row class sizes
+# are summed in limbs of 30 bits each, which keeps every sum exact in floating point for up to 2^23 row classes,
+# and the limbs are put back together as Python integers.
+def range_coefficients(task, block=64, limb_bits=30):
+    w, h, first, last = task
+    columns = list(partitions(w))[first:last]
+    rows = list(partitions(h))
+    exponent_count = w*h + 1
+
+    lengths = np.arange(1, max(w, h) + 1)
+    gcd_table = np.gcd.outer(lengths[:w], lengths[:h])
+    # The products are done in floating point, which is exact for integers this small, and much faster
+    row_weights = gcd_table.dot(multiplicity_matrix(rows, h).T).astype(np.float64)
+
+    row_limbs = list()
+    row_sizes = [size for _, size in rows]
+    while any(row_sizes):
+        row_limbs.append(np.array([size & ((1 << limb_bits) - 1) for size in row_sizes], dtype=np.float64))
+        row_sizes = [size >> limb_bits for size in row_sizes]
+
+    coefficients = np.zeros(exponent_count, dtype=object)
+    for start in range(0, len(columns), block):
+        block_columns = columns[start:start+block]
+        exponents = multiplicity_matrix(block_columns, w).dot(row_weights).astype(np.int64)
+        bins = (np.arange(len(block_columns))[:, np.newaxis]*exponent_count + exponents).ravel()
+
+        sums = np.zeros((len(block_columns), exponent_count), dtype=object)
+        for limb, weights in enumerate(row_limbs):
+            limb_sums = np.bincount(bins, weights=np.tile(weights, len(block_columns)),
+                                    minlength=len(block_columns)*exponent_count)
+            sums += limb_sums.astype(np.int64).reshape(sums.shape).astype(object)*(1 << (limb*limb_bits))
+
+        column_sizes = np.array([size for _, size in block_columns], dtype=object)
+        coefficients += column_sizes.dot(sums)
+    return [int(coefficient) for coefficient in coefficients]
+
+
+# Matrix with a row of multiplicities for every partition of n, padded with zeros to n cycle lengths.
+def multiplicity_matrix(partitions_of_n, n):
+    matrix = np.zeros((len(partitions_of_n), n), dtype=np.int64)
+    for index, (cycles, _) in enumerate(partitions_of_n):
+        matrix[index, :len(cycles)] = cycles
+    return matrix
+
+
+# Cache of the partitions of every number fully generated so far, along with their conjugacy class sizes.
+partition_cache = dict()
+
+
+# Generator of the partitions of n, each as a tuple of multiplicities along with its conjugacy class size.
+# The partitions are streamed as they are generated, and only cached once all of them have been generated.
+def partitions(n):
+    if n in partition_cache:
+        for partition in partition_cache[n]:
+            yield partition
+        return
+
+    generated = list()
+    for cycles in cycle_multiplicities(n, n):
+        # Drop the trailing zeros, as there are no cycles that long
+        length = len(cycles)
+        while length > 0 and cycles[length-1] == 0:
+            length -= 1
+        partition = (cycles[:length], class_size(n, cycles))
+        generated.append(partition)
+        yield partition
+    partition_cache[n] = generated
+
+
+# Generator of the multiplicities of the partitions of n into cycles of at most the given length, as tuples of the
+# number of cycles of length 1 up to that length. The number of cycles of the longest length is picked first, from
+# the most down, and the rest of n is then partitioned into shorter cycles.
+def cycle_multiplicities(n, longest):
+    if longest <= 1:
+        yield (n,) if longest == 1 else ()
+        return
+    for count in range(n//longest, -1, -1):
+        for shorter in cycle_multiplicities(n - count*longest, longest - 1):
+            yield shorter + (count,)
+
+
+# Number of permutations of n items with the given number of cycles of every length.
+def class_size(n, cycles):
+    centralizer = 1
+    for length in range(1, len(cycles)+1):
+        count = cycles[length-1]
+        centralizer = centralizer*factorial(count)*(length**count)
+    return factorial(n)//centralizer
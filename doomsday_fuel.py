@@ -36,14 +36,37 @@
 # as the i,j entry of this product matrix. The special case of starting state i = 0, which is
 # the first row of this matrix, is our solution.
 
-# The following algorithm maintains all the probabilities as fractions through out, as the required
-# solution is as a fraction.
+# Rather than inverting I - T (cofactor expansion costs O(n!) operations), we solve the linear
+# system (I - T)*X = A directly. Multiplying every transient row of the system by its row sum
+# turns all the probabilities back into the integer counts of the input matrix, so the system can
+# be solved with fraction-free (Bareiss) Gaussian elimination in O(n^3) integer operations.
+# Every division in the elimination is exact and all intermediate values stay bounded by the
+# determinants of sub-matrices. The result is a matrix of integer numerators over the common
+# denominator det(I - T), which we reduce to the required fraction format at the end.
 
+# Real transition matrices are mostly zeros and many states are never reached from state 0.
+# The default (sparse) engine therefore keeps every state as an adjacency list of its non-zero
+# transitions and only walks the states reachable from state 0. The reachable transient states are
+# split into strongly connected components, which are solved one at a time in reverse topological
+# order: once every component downstream of a component is solved, the probabilities of its states
+# only depend on each other and on already known values. Each component is a small system solved by
+# the same fraction-free elimination, so the work scales with the number of non-zero transitions
+# and the size of the largest component rather than with n^2.
 
-from fractions import Fraction as f, gcd
 
+from collections import OrderedDict
+from fractions import Fraction
+from functools import reduce
 
-def solution(m):
+import numpy as np
+
+try:
+    from math import gcd
+except ImportError:
+    from fractions import gcd
+
+
+def solution(m, method="sparse"):
     if sum(m[0]) == 0:
         # If there is only 1 terminal state, return probability 1.
         if len(m) <= 1:
@@ -60,109 +83,532 @@ def solution(m):
             result.append(1)
             return result
 
-    absorbing_states = list()
-    T = list()
-    A = list()
+    if method == "sparse":
+        return sparse_solution(build_adjacency(m))
+    if method == "dense":
+        return dense_solution(m)
+    if method == "modular":
+        return modular_solution(m)
+    if method == "float":
+        return float_solution(m)
+    raise ValueError("Unknown method: %s" % method)
+
+
+# Solves the chain over the full dense matrices T and A, reusing the cached
+# factorization of I - T if the same matrix was solved before.
+def dense_solution(m):
+    return get_solver(m).absorption_row(0)
+
 
-    # Identify all terminal states
+# Identifies the terminal (absorbing) and transient states of the chain and builds the integer
+# system M*X = B, where M is I - T and B is A, with every row scaled by the row sum of the
+# corresponding state in the input matrix.
+def build_system(m):
+    absorbing_states = list()
+    transient_states = list()
     for i in range(len(m)):
-        sm = sum(m[i])
-        if sm == 0:
+        if sum(m[i]) == 0:
             absorbing_states.append(i)
+        else:
+            transient_states.append(i)
+
+    M = list()
+    B = list()
+    for i in transient_states:
+        row = m[i]
+        m_row = [-row[j] for j in transient_states]
+        m_row[len(M)] += sum(row)
+        M.append(m_row)
+        B.append([row[j] for j in absorbing_states])
+    return absorbing_states, transient_states, M, B
+
+
+# Solves the chain in floating point first and only falls back to the exact sparse engine if
+# the floating point answer cannot be certified. As in modular_solution, only the first row y
+# of the inverse of M is needed, which solves M^T*y = e_0. Every entry of the float solution is
+# turned into the closest fraction with a bounded denominator (continued fractions), and the
+# candidate is accepted only if it satisfies M^T*y = e_0 exactly. Since M is non-singular, a
+# candidate that passes this check is the exact solution.
+def float_solution(m, max_denominator=10**6):
+    absorbing_states, transient_states, M, B = build_system(m)
+    n = len(M)
+    e_0 = np.zeros(n)
+    e_0[0] = 1
+    try:
+        y = np.linalg.solve(np.array(M, dtype=float).T, e_0)
+    except np.linalg.LinAlgError:
+        return sparse_solution(build_adjacency(m))
+
+    candidates = [Fraction(value).limit_denominator(max_denominator) for value in y.tolist()]
+    denominator = reduce(lcm_two_nums, [x.denominator for x in candidates], 1)
+    y_numerators = [x.numerator*(denominator // x.denominator) for x in candidates]
+    for i in range(n):
+        if sum(row[i]*y_numerators[j] for j, row in enumerate(M) if row[i] != 0) != (denominator if i == 0 else 0):
+            return sparse_solution(build_adjacency(m))
+
+    numerators = [sum(y_numerators[i]*B[i][c] for i in range(n) if B[i][c] != 0) for c in range(len(absorbing_states))]
+    return reduce_to_common_denominator(numerators, denominator)
+
+
+# Solves the chain with arithmetic modulo several word-sized primes. Only the first row y of
+# the inverse of M is needed, i.e. the solution of the transposed system M^T*y = e_0, since the
+# answer is then y*B. The system is solved modulo a batch of primes at a time and the residues are
+# combined with the Chinese remainder theorem, until rational reconstruction of y gives values
+# that satisfy the system exactly. By Hadamard's inequality, the numerators and denominators of y
+# are bounded by the product of the column norms of M, which bounds the number of primes needed.
+def modular_solution(m, primes_per_batch=8):
+    absorbing_states, transient_states, M, B = build_system(m)
+    n = len(M)
+    transposed = np.array(M, dtype=object).T
+    columns = [[(j, row[i]) for j, row in enumerate(M) if row[i] != 0] for i in range(n)]
+
+    # Reconstruction is guaranteed once the product of the primes exceeds 2*bound^2
+    bound_bits = sum((sum(value*value for _, value in column).bit_length() + 1) // 2 for column in columns)
+    required_bits = 2*bound_bits + 2
+
+    residues = [0]*n
+    modulus = 1
+    previous = None
+    primes = word_sized_primes()
+    while True:
+        batch = [next(primes) for _ in range(primes_per_batch)]
+        solutions, valid = solve_mod_primes(transposed, batch)
+
+        # For a non-singular M only a few primes can divide a pivot, so a whole batch of
+        # invalid primes means that M is singular.
+        if modulus == 1 and not valid.any():
+            raise ValueError("I - T is singular: some transient states never reach a terminal state")
+
+        # Combine the residues with the Chinese remainder theorem, skipping the
+        # primes that divide one of the pivots.
+        for p, y, ok in zip(batch, solutions, valid):
+            if not ok:
+                continue
+            inverse_of_modulus = pow(modulus % p, p - 2, p)
+            for i in range(n):
+                residues[i] += modulus*(((int(y[i]) - residues[i])*inverse_of_modulus) % p)
+            modulus *= p
+
+        # Reconstructing the whole vector and checking it exactly is only worth it once
+        # the first entry reconstructs to the same value for two batches in a row.
+        past_bound = modulus.bit_length() > required_bits
+        first = rational_reconstruction(residues[0], modulus)
+        if not past_bound and (first is None or first != previous):
+            previous = first
+            continue
+        previous = first
+
+        # Past the Hadamard bound, reconstruction and the exact check can only fail if M is singular.
+        reconstructed = reconstruct_with_common_denominator(residues, modulus)
+        if reconstructed is not None:
+            y_numerators, denominator = reconstructed
+            if all(sum(value*y_numerators[j] for j, value in columns[i]) == (denominator if i == 0 else 0)
+                   for i in range(n)):
+                break
+        if past_bound:
+            raise ValueError("I - T is singular: some transient states never reach a terminal state")
+
+    numerators = [sum(y_numerators[i]*B[i][c] for i in range(n) if B[i][c] != 0) for c in range(len(absorbing_states))]
+    return reduce_to_common_denominator(numerators, denominator)
+
+
+# Solves the square integer system A*x = e_0 modulo each of the given primes at once, by
+# Gaussian elimination on a stack of int64 matrices. Since every prime is below 2^31, each
+# product of two residues fits in 63 bits and a row update only needs a single reduction.
+# M^T is a non-singular M-matrix, so all of its leading principal minors are non-zero and no
+# pivoting is needed; a prime that divides one of them is marked invalid instead.
+# Returns the solutions (one row per prime) and the validity of every prime.
+def solve_mod_primes(A, primes):
+    n = A.shape[0]
+    p = np.array(primes, dtype=np.int64)
+    p_rows = p[:, None]
+    p_matrices = p[:, None, None]
+    a = np.zeros((len(primes), n, n+1), dtype=np.int64)
+    for b, prime in enumerate(primes):
+        a[b, :, :n] = (A % prime).astype(np.int64)
+    a[:, 0, n] = 1
+    valid = np.ones(len(primes), dtype=bool)
+
+    # Forward elimination, normalizing every pivot row to a leading 1
+    for k in range(n):
+        pivots = a[:, k, k]
+        valid &= pivots != 0
+        inverses = np.array([pow(int(pivot), prime - 2, prime) for pivot, prime in zip(pivots, primes)], dtype=np.int64)
+        a[:, k, k+1:] = (a[:, k, k+1:]*inverses[:, None]) % p_rows
+        if k + 1 < n:
+            block = a[:, k+1:, k+1:]
+            block -= a[:, k+1:, k, None]*a[:, k, None, k+1:]
+            np.remainder(block, p_matrices, out=block)
+
+    # Back substitution
+    x = np.zeros((len(primes), n), dtype=np.int64)
+    for i in range(n-1, -1, -1):
+        products = (a[:, i, i+1:n]*x[:, i+1:]) % p_rows
+        x[:, i] = (a[:, i, n] - products.sum(axis=1) % p) % p
+    return x, valid
+
+
+# Rational reconstruction of a whole vector of residues. All the entries of y share the
+# denominator det(M), so once some entries are reconstructed, the running common denominator
+# usually turns the next residue into a small integer directly and the extended Euclidean
+# algorithm is only needed when a new factor of the denominator shows up.
+# Returns the numerators and their common denominator, or None if reconstruction fails.
+def reconstruct_with_common_denominator(residues, modulus):
+    numerators = list()
+    denominator = 1
+    for residue in residues:
+        value = denominator*residue % modulus
+        if 2*value > modulus:
+            value -= modulus
+        if 2*value*value > modulus:
+            fraction = rational_reconstruction(value, modulus)
+            if fraction is None:
+                return None
+            value, extra_denominator = fraction
+            numerators = [x*extra_denominator for x in numerators]
+            denominator *= extra_denominator
+            if 2*denominator*denominator > modulus:
+                return None
+        numerators.append(value)
+    return numerators, denominator
+
+
+# Rational reconstruction of u modulo the given modulus with the extended Euclidean algorithm.
+# Returns the (numerator, denominator) pair with both absolute values below sqrt(modulus/2)
+# that is congruent to u, or None if there is no such fraction.
+def rational_reconstruction(u, modulus):
+    r0, r1 = modulus, u % modulus
+    s0, s1 = 0, 1
+    while 2*r1*r1 > modulus:
+        q = r0 // r1
+        r0, r1 = r1, r0 - q*r1
+        s0, s1 = s1, s0 - q*s1
+    if s1 == 0 or 2*s1*s1 > modulus or gcd(r1, s1) != 1:
+        return None
+    if s1 < 0:
+        return -r1, -s1
+    return r1, s1
+
+
+# Generates the primes below 2^31 in decreasing order, using a deterministic Miller-Rabin test
+# (bases 2, 3, 5 and 7 are enough for every number below 3.2*10^9).
+def word_sized_primes():
+    candidate = 2**31 - 1
+    while candidate > 2:
+        if is_prime(candidate):
+            yield candidate
+        candidate -= 2
+
+
+def is_prime(n):
+    d = n - 1
+    r = 0
+    while d % 2 == 0:
+        d //= 2
+        r += 1
+    for base in (2, 3, 5, 7):
+        if n == base:
+            return True
+        x = pow(base, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(r - 1):
+            x = x*x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
 
-    # Add probabilities of reaching terminal states to the matrix A
-    # and all transient state transition probabilities to the matrix T.
+# Converts the dense transition matrix into adjacency lists holding only the
+# non-zero transitions of every state, as (next state, count) pairs.
+def build_adjacency(m):
+    adjacency = list()
     for row in m:
-        t_row = list()
-        a_row = list()
-        sm = sum(row)
-        if sm != 0:
-            for i in range(len(m)):
-                if i in absorbing_states:
-                    a_row.append(f(row[i], sm))
+        adjacency.append([(j, count) for j, count in enumerate(row) if count != 0])
+    return adjacency
+
+
+# Solves the chain given as adjacency lists, starting from the transient state start.
+# Terminal states are the states without any outgoing transitions.
+def sparse_solution(adjacency, start=0):
+    absorbing = [not edges for edges in adjacency]
+    row_sums = [sum(count for _, count in edges) for edges in adjacency]
+
+    # Probabilities of reaching the terminal states from every solved transient state,
+    # as a sparse {terminal state: numerator} dict and a common denominator.
+    solved = dict()
+
+    # The components come out of Tarjan's algorithm with every component after all the
+    # components reachable from it, so each one only depends on already solved states.
+    for component in strongly_connected_components(adjacency, absorbing, start):
+        position = dict((state, i) for i, state in enumerate(component))
+
+        # Bring all the known values on the right hand side to a common denominator.
+        scale = 1
+        for state in component:
+            for j, _ in adjacency[state]:
+                if not absorbing[j] and j not in position:
+                    scale = lcm_two_nums(scale, solved[j][1])
+
+        # Build the integer system for this component, with one column per terminal
+        # state that can be reached from it.
+        columns = dict()
+        M = list()
+        rhs_rows = list()
+        for state in component:
+            m_row = [0]*len(component)
+            m_row[position[state]] = row_sums[state]
+            rhs = dict()
+            for j, count in adjacency[state]:
+                if j in position:
+                    m_row[position[j]] -= count
+                elif absorbing[j]:
+                    rhs[j] = rhs.get(j, 0) + count*scale
                 else:
-                    t_row.append(f(row[i], sm))
-            T.append(t_row)
-            A.append(a_row)
-
-    i_minus_t = list()
-
-    # Calulcate I - T. Since we are maintaining all values in fractions, we refrain
-    # from using numpy arrays and manually perform matrix operations. Because the maximum size
-    # of given transition matrix will only be 10x10 by design of the problem, this is not computationally
-    # too expensive.
-    for i in range(len(T)):
-        row = list()
-        for j in range(len(T)):
-            if i == j:
-                row.append(f(1, 1) - T[i][j])
+                    numerators, denominator = solved[j]
+                    factor = count*(scale // denominator)
+                    for terminal, numerator in numerators.items():
+                        rhs[terminal] = rhs.get(terminal, 0) + factor*numerator
+            for terminal in rhs:
+                if terminal not in columns:
+                    columns[terminal] = len(columns)
+            M.append(m_row)
+            rhs_rows.append(rhs)
+
+        B = list()
+        for rhs in rhs_rows:
+            b_row = [0]*len(columns)
+            for terminal, value in rhs.items():
+                b_row[columns[terminal]] = value
+            B.append(b_row)
+
+        numerators, determinant = bareiss_solve(M, B)
+        denominator = determinant*scale
+        for state in component:
+            row = numerators[position[state]]
+            divisor = reduce(gcd, row, denominator)
+            if denominator < 0:
+                divisor = -divisor
+            solved[state] = (dict((terminal, row[c] // divisor) for terminal, c in columns.items() if row[c] != 0),
+                             denominator // divisor)
+
+    # Report every terminal state of the chain, reachable or not, in order.
+    numerators, denominator = solved[start]
+    return reduce_to_common_denominator(
+        [numerators.get(state, 0) for state in range(len(adjacency)) if absorbing[state]], denominator)
+
+
+# Iterative version of Tarjan's algorithm over the transient states reachable from start.
+# Returns the strongly connected components in reverse topological order, i.e. every
+# component is listed after all the components that can be reached from it.
+def strongly_connected_components(adjacency, absorbing, start):
+    index = dict()
+    lowlink = dict()
+    stack = list()
+    on_stack = set()
+    components = list()
+
+    index[start] = lowlink[start] = 0
+    stack.append(start)
+    on_stack.add(start)
+    work = [(start, iter(adjacency[start]))]
+    while work:
+        state, successors = work[-1]
+        descended = False
+        for j, _ in successors:
+            if absorbing[j]:
+                continue
+            if j not in index:
+                index[j] = lowlink[j] = len(index)
+                stack.append(j)
+                on_stack.add(j)
+                work.append((j, iter(adjacency[j])))
+                descended = True
+                break
+            if j in on_stack and index[j] < lowlink[state]:
+                lowlink[state] = index[j]
+        if descended:
+            continue
+
+        work.pop()
+        if work:
+            parent = work[-1][0]
+            if lowlink[state] < lowlink[parent]:
+                lowlink[parent] = lowlink[state]
+        if lowlink[state] == index[state]:
+            component = list()
+            while True:
+                member = stack.pop()
+                on_stack.discard(member)
+                component.append(member)
+                if member == state:
+                    break
+            components.append(component)
+    return components
+
+
+# Solves M*X = B for integer matrices M (n x n) and B (n x k) using fraction-free Gaussian
+# elimination. Returns the integer numerators of X and their common denominator, such that
+# X = numerators/denominator.
+def bareiss_solve(M, B):
+    return bareiss_substitute(bareiss_factorize(M), B)
+
+
+# Fraction-free (Bareiss) forward elimination of the integer matrix M. After step k, every
+# entry below the diagonal of column k is 0 and the remaining entries are determinants of
+# (k+2)x(k+2) sub-matrices, so the division by the previous pivot is always exact.
+# Returns the row swap and the elimination factors of every step along with the resulting
+# upper triangular matrix, which is all that is needed to replay the elimination on any
+# right hand side later.
+def bareiss_factorize(M):
+    n = len(M)
+    a = [list(row) for row in M]
+    swaps = list()
+    factors = list()
+    previous_pivot = 1
+
+    for k in range(n):
+        r = k
+        if a[k][k] == 0:
+            for r in range(k+1, n):
+                if a[r][k] != 0:
+                    a[k], a[r] = a[r], a[k]
+                    break
             else:
-                row.append(f(0, 1) - T[i][j])
-        i_minus_t.append(row)
-
-    S = inverse(i_minus_t)     # Inverse of I-T
-    R = matrix_multiply(S, A)    # Multiplying inverse of I-T by probability of reaching absorbing states
-
-    # Reducing the probabilities in the 0th row to a common denominator and returning result
-    result = list()
-    common_denominator = lcm([x.denominator for x in R[0]])
-    for element in R[0]:
-        factor = common_denominator/element.denominator
-        result.append(element.numerator*factor)
-    result.append(common_denominator)
+                raise ValueError("I - T is singular: some transient states never reach a terminal state")
+        swaps.append(r)
+
+        pivot_row = a[k]
+        pivot = pivot_row[k]
+        step_factors = list()
+        for i in range(k+1, n):
+            row = a[i]
+            factor = row[k]
+            step_factors.append(factor)
+            for j in range(k+1, n):
+                row[j] = (pivot*row[j] - factor*pivot_row[j]) // previous_pivot
+            row[k] = 0
+        factors.append(step_factors)
+        previous_pivot = pivot
+
+    return swaps, factors, a
+
+
+# Replays the elimination of a factorization from bareiss_factorize on the integer right
+# hand side B (n x k) and back substitutes. Returns the integer numerators of the solution
+# and their common denominator.
+def bareiss_substitute(factorization, B):
+    swaps, factors, U = factorization
+    n = len(U)
+    b = [list(row) for row in B]
+    previous_pivot = 1
+
+    for k in range(n):
+        r = swaps[k]
+        if r != k:
+            b[k], b[r] = b[r], b[k]
+        pivot = U[k][k]
+        pivot_row = b[k]
+        for i in range(k+1, n):
+            factor = factors[k][i-k-1]
+            b[i] = [(pivot*x - factor*y) // previous_pivot for x, y in zip(b[i], pivot_row)]
+        previous_pivot = pivot
+
+    # The last pivot is the determinant of M (up to the sign of the row swaps), which is
+    # the common denominator of the solution. Back substitution on the numerators is exact too.
+    determinant = previous_pivot
+    numerators = [None]*n
+    for i in range(n-1, -1, -1):
+        row = U[i]
+        numerator_row = list()
+        for c in range(len(b[i])):
+            value = determinant*b[i][c]
+            for j in range(i+1, n):
+                if row[j] != 0:
+                    value -= row[j]*numerators[j][c]
+            numerator_row.append(value // row[i])
+        numerators[i] = numerator_row
+    return numerators, determinant
+
+
+# Reduces a list of numerators over a common denominator to the lowest common denominator
+# and returns them in the required [numerators..., denominator] format.
+def reduce_to_common_denominator(numerators, denominator):
+    if denominator < 0:
+        numerators = [-x for x in numerators]
+        denominator = -denominator
+    divisor = reduce(gcd, numerators, denominator)
+    result = [x // divisor for x in numerators]
+    result.append(denominator // divisor)
     return result
 
 
-def matrix_multiply(X, Y):
-    return [[sum(a*b for a, b in zip(X_row, Y_col)) for Y_col in zip(*Y)] for X_row in X]
-
-
-def transpose(m):
-    return map(list, zip(*m))
-
-
-def matrix_minor(m, i, j):
-    return [row[:j] + row[j+1:] for row in (m[:i]+m[i+1:])]
-
-
-def matrix_determinant(m):
-    # 2x2 matrix
-    if len(m) == 2:
-        return m[0][0]*m[1][1]-m[0][1]*m[1][0]
-
-    determinant = 0
-    for c in range(len(m)):
-        determinant += ((-1)**c)*m[0][c]*matrix_determinant(matrix_minor(m, 0, c))
-    return determinant
-
-
-def inverse(m):
-    determinant = matrix_determinant(m)
-
-    # 2x2 matrix:
-    if len(m) == 2:
-        return [[m[1][1]/determinant, -1*m[0][1]/determinant],
-                [-1*m[1][0]/determinant, m[0][0]/determinant]]
-
-    # Calculate co-factor matrix
-    co_factors = []
-    for r in range(len(m)):
-        co_factor_row = []
-        for c in range(len(m)):
-            minor = matrix_minor(m, r, c)
-            co_factor_row.append(((-1)**(r+c)) * matrix_determinant(minor))
-        co_factors.append(co_factor_row)
-
-    co_factors = transpose(co_factors)
-    for r in range(len(co_factors)):
-        for c in range(len(co_factors)):
-            co_factors[r][c] = co_factors[r][c]/determinant
-    return co_factors
-
-
 def lcm_two_nums(a, b):
-    return a*b/gcd(a, b)
-
-
-def lcm(lst):
-    return reduce(lcm_two_nums, lst)
+    return a*b // gcd(a, b)
+
+
+# Solver for repeated questions about the same chain. I - T is factorized once on construction,
+# after which the absorption probabilities from any start state, or the solutions for any number
+# of right hand sides (e.g. different payoffs of the terminal states), only cost a replay of the
+# elimination and a back substitution each.
+class AbsorbingChainSolver:
+    def __init__(self, m):
+        self.absorbing_states, self.transient_states, M, self.counts = build_system(m)
+        self.transient_index = dict((state, i) for i, state in enumerate(self.transient_states))
+        self.row_sums = [sum(m[i]) for i in self.transient_states]
+
+        self.factorization = bareiss_factorize(M)
+        self.absorption = None
+
+    # Returns the probabilities of reaching every terminal state from every transient state,
+    # as integer numerators (one row per transient state) over a common denominator.
+    def absorption_matrix(self):
+        if self.absorption is None:
+            self.absorption = bareiss_substitute(self.factorization, self.counts)
+        return self.absorption
+
+    # Returns the probabilities of reaching every terminal state from the given start state
+    # in the [numerators..., denominator] format of solution().
+    def absorption_row(self, start):
+        if start not in self.transient_index:
+            return [int(state == start) for state in self.absorbing_states] + [1]
+        numerators, denominator = self.absorption_matrix()
+        return reduce_to_common_denominator(numerators[self.transient_index[start]], denominator)
+
+    # Solves (I - T)*X = R for a batch of right hand sides R, given with one row per transient
+    # state and one column per right hand side. Entries may be integers or Fractions.
+    # Returns X as rows of Fractions.
+    def solve(self, rhs):
+        scale = 1
+        for row in rhs:
+            for value in row:
+                scale = lcm_two_nums(scale, Fraction(value).denominator)
+        B = [[int(Fraction(value)*scale)*sm for value in row] for row, sm in zip(rhs, self.row_sums)]
+        numerators, determinant = bareiss_substitute(self.factorization, B)
+        return [[Fraction(x, determinant*scale) for x in row] for row in numerators]
+
+    # Returns the expected payoff from every transient state for a batch of payoff vectors,
+    # given with one row per terminal state and one column per payoff vector.
+    def expected_payoffs(self, payoffs):
+        return self.solve([[sum(Fraction(count, sm)*payoff[c] for count, payoff in zip(counts, payoffs))
+                            for c in range(len(payoffs[0]))] for counts, sm in zip(self.counts, self.row_sums)])
+
+
+# Global LRU cache of solvers, keyed by the (hashable) transition matrix.
+solver_cache = OrderedDict()
+solver_cache_size = 32
+
+
+# Returns the solver for the transition matrix m, factorizing I - T only if the
+# matrix is not in the cache already.
+def get_solver(m):
+    key = tuple(tuple(row) for row in m)
+    solver = solver_cache.pop(key, None)
+    if solver is None:
+        solver = AbsorbingChainSolver(m)
+    solver_cache[key] = solver
+    while len(solver_cache) > solver_cache_size:
+        solver_cache.popitem(last=False)
+    return solver
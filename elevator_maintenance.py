@@ -1,31 +1,49 @@
-def solution(l):
-    # -Split every version number by '.' to get individual major,
-    # minor and revision numbers
-    # -Sort by integer value of the revision first, then minor, then major,
-    # using key functions which return the integer value for each
-    # Join the major,minor and revision in the sorted list by '.' and return the string
-    return ['.'.join(x) for x in sorted(sorted(sorted([x.split('.') for x in l], key=get_revision), key=get_minor), key=get_major)]
+import heapq
+import tempfile
+from itertools import islice
+
 
+def solution(l):
+    # -Split every version number by '.' once to get the integer values of the
+    # major, minor and revision numbers
+    # -Sort on the tuple of the three numbers, which orders by major, then
+    # minor, then revision
+    return sorted(l, key=version_key)
 
-# Key Function that returns integer value of major or -1 if not exists
-def get_major(x):
-    if len(x) > 0:
-        return int(x[0])
-    else:
-        return -1
 
+# Key Function that returns the integer values of major, minor and revision,
+# with -1 for the ones which don't exist
+def version_key(x):
+    parts = x.split('.')
+    return (int(parts[0]) if len(parts) > 0 else -1,
+            int(parts[1]) if len(parts) > 1 else -1,
+            int(parts[2]) if len(parts) > 2 else -1)
 
-# Key Function that returns integer value of minor or -1 if not exists
-def get_minor(x):
-    if len(x) > 1:
-        return int(x[1])
-    else:
-        return -1
 
+# Sorts the version numbers in the input file, one per line, into the output
+# file with bounded memory
+# -Read the input a chunk of lines at a time, sort every chunk and write it
+# out to a temporary file
+# -Merge the sorted temporary files into the output, keeping only the next
+# version number of every temporary file in memory. The merge takes the
+# earlier file first for equal versions, so the order is the same as that of
+# sorting the whole file at once
+def sort_file(input_path, output_path, chunk_size=1000000):
+    runs = list()
+    try:
+        with open(input_path) as source:
+            while True:
+                lines = list(islice(source, chunk_size))
+                if not lines:
+                    break
+                run = tempfile.TemporaryFile(mode='w+')
+                runs.append(run)
+                run.writelines(x + '\n' for x in solution([line.strip() for line in lines if line.strip()]))
+                run.seek(0)
 
-# Key Function that returns integer value of revision or -1 if not exists
-def get_revision(x):
-    if len(x) > 2:
-        return int(x[2])
-    else:
-        return -1
+        with open(output_path, 'w') as target:
+            merged = heapq.merge(*[(line.rstrip('\n') for line in run) for run in runs], key=version_key)
+            target.writelines(x + '\n' for x in merged)
+    finally:
+        for run in runs:
+            run.close()
@@ -27,18 +27,81 @@
 # us with a corner case of 3 though, which leaves a reminder of 3 but we need to subtract 1 instead of add
 # for optimum steps. Hence, we add a condition for this.
 
+# Rather than taking one step at a time, we work on whole runs of bits at once. A run of k trailing zeros takes
+# k halving steps, which is a single shift by k. A run of k > 1 trailing ones is turned into a run of k trailing
+# zeros by adding 1, after which the k halving steps follow, so the whole run takes k + 1 steps. A number ending
+# in 01 (or the number 3) has 1 subtracted instead. The bit_length of the lowest set bit gives the length of a run
+# of zeros, and the same trick on m + 1 gives the length of a run of ones, so every run costs a couple of integer
+# operations, regardless of the size of the number.
+
+
+import numpy as np
+
+# Numbers up to this one can take the vectorized path, as adding 1 to them still fits in 64 bits
+UINT64_LIMIT = 2**64 - 2
+
 
 def solution(m):
     m = int(m)
     if m == 0:
         return 0
     steps = 0
-    while m != 1:
-        if m % 2 == 0:
-            m = m/2
-        elif m == 3 or m % 4 == 1:
+    while True:
+        # Halve away the run of trailing zeros
+        zeros = (m & -m).bit_length() - 1
+        m >>= zeros
+        steps += zeros
+        if m == 1:
+            return steps
+        if m == 3 or m & 2 == 0:
             m -= 1
+            steps += 1
         else:
-            m += 1
-        steps += 1
-    return steps
+            # Add 1 to turn the run of trailing ones into zeros, and halve them away
+            ones = ((m ^ (m + 1)).bit_length() - 1)
+            m = (m >> ones) + 1
+            steps += ones + 1
+
+
+# Solves every one of the given pellet counts. The counts which fit in 64 bits are solved together, one run of
+# bits at a time over the whole array, and any larger ones are solved one by one. The results of an array
+# come back as nested lists of the same shape.
+def solution_many(ms):
+    if isinstance(ms, np.ndarray) and ms.dtype.kind in 'ui' and (ms.size == 0 or (ms.min() >= 0 and ms.max() <= UINT64_LIMIT)):
+        return small_solutions(ms.ravel().astype(np.uint64)).reshape(ms.shape).tolist()
+
+    ms = [int(m) for m in ms]
+    results = [None]*len(ms)
+    small = [index for index, m in enumerate(ms) if m <= UINT64_LIMIT]
+    small_steps = small_solutions(np.array([ms[index] for index in small], dtype=np.uint64))
+    for index, steps in zip(small, small_steps.tolist()):
+        results[index] = steps
+    for index, m in enumerate(ms):
+        if results[index] is None:
+            results[index] = solution(m)
+    return results
+
+
+def small_solutions(ms):
+    one = np.uint64(1)
+    # Zero takes no steps, just like one
+    m = np.maximum(ms, one)
+    steps = np.zeros(len(m), dtype=np.int64)
+    while True:
+        # Halve away the run of trailing zeros. The lowest set bit is a power of 2, so its log is exact.
+        zeros = np.log2((m & (~m + one)).astype(np.float64)).astype(np.uint64)
+        m >>= zeros
+        steps += zeros.astype(np.int64)
+
+        # The numbers still above 1 are all odd here
+        active = m != 1
+        if not active.any():
+            return steps
+
+        # Subtract 1 from the numbers ending in 01 (and from 3), and add 1 to the rest of the odd ones,
+        # halving away their run of trailing ones along with it
+        subtract = active & ((m == 3) | ((m & np.uint64(2)) == 0))
+        add = active & ~subtract
+        ones = np.log2((((m ^ (m + one)) >> one) + one).astype(np.float64)).astype(np.uint64)
+        m = np.where(add, (m >> ones) + one, m - subtract.astype(np.uint64))
+        steps += subtract + np.where(add, ones.astype(np.int64) + 1, 0)
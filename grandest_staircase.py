@@ -1,28 +1,33 @@
 # This problem, at its core, is a partition problem in Number theory.
 # The problem can be defined as the number of partitions of a number n
 # in which there are atleast 2 non-zero parts and the parts are all distinct.
-# From Euler's generating function for the infinite
-# sequence of the number of partitions of n, a recurrence relation
-# for the number of partitions can be derived as follows:
-#       p(n) = (1/n)*sum(sigma(k)*p(n-k))
-# where sigma(k) is the number of divisors of k, p(n-k) is the number of
-# partitions of the number n-k and the sum is over k from 1 to n.
-# But in this problem, we are interested in the partitions of n with distinct parts only.
-# By a property of integer partitions, the number of partitions with distinct parts
-# is always equal to the number of partitions with odd parts.
-# We can derive a recurrence relation for the number of partitions with odd parts
-# where the sum of divisors in the above relation is relaced with the sum of odd
-# divisors only. This gives us the total  number of partitions with distinct parts as follows:
+# We count the partitions of n into distinct parts, q(n), and subtract 1 for the
+# trivial case of the partition with only 1 element - the number itself.
+#
+# One way to get q(n) is the recurrence derived from Euler's generating function,
 #      q(n) = (1/n)*sum(sigma_(k)*q(n-k))
-# where q(n) is number of partitions with distinct parts,
-# sigma_(k) is sum of odd divisors of k and sum is over k from 1 to n.
-# Finally, we subtract 1 for the trivial case of the partition with
-# only 1 element - the number itself.
+# where sigma_(k) is the sum of odd divisors of k and the sum is over k from 1 to n.
+# But that needs all of q(0)...q(n-1) and a sum over n terms for every n, i.e. O(n^2)
+# work plus the divisor sums. Euler's pentagonal number theorem gives a much shorter
+# recurrence, which is the one used here. The generating function of p(n), the number
+# of all partitions of n, is 1/E(x), where
+#      E(x) = prod(1 - x^k) = sum((-1)^k * x^(k(3k-1)/2))
+# is a sum over the generalized pentagonal numbers k(3k-1)/2, k = 0, 1, -1, 2, -2, ...
+# Since E(x)*P(x) = 1, this gives
+#      p(n) = p(n-1) + p(n-2) - p(n-5) - p(n-7) + p(n-12) + p(n-15) - ...
+# The generating function of q(n) is prod(1 + x^k) = E(x^2)/E(x), so E(x)*Q(x) = E(x^2)
+# and q(n) follows the same recurrence, plus the coefficient of x^n in E(x^2).
+# There are only O(sqrt(n)) pentagonal numbers up to n, so filling a table of
+# q(0)...q(n) bottom-up takes O(n^1.5) additions and no recursion at all.
 
-import numpy as np
+import mmap
+import struct
+import sys
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
 
-#Global lookup table to cache the number of partitions of a number
-lookup = dict()
+import numpy as np
 
 
 def solution(n):
@@ -30,52 +35,226 @@ def solution(n):
     return number_of_partitions(n) - 1
 
 
+#Function to answer a whole list of n values, from a single table up to the largest one
+def solution_many(ns):
+    if not ns:
+        return list()
+    largest = max(ns)
+    if table is not None and 0 <= min(ns) and largest <= table.size:
+        return [table.distinct_partitions(n) - 1 for n in ns]
+    counts = distinct_counts_up_to(max(largest, 0))
+    #A negative number has no partitions
+    return [counts[n] - 1 if n >= 0 else -1 for n in ns]
+
+
 def number_of_partitions(n):
-    # Check lookup table first to avoid recalculation
-    if n in lookup.keys():
-        return lookup[n]
-
-    #Initialize summation
-    summation = 0
-
-    #Initializing q(0) = q(1) = 1
-    if n == 0:
-        return 1
-
-    if n == 1:
-        return 1
-
-    #Loop for summation over k from 1 to n
-    for k in range(1, n+1):
-        #Recursive call for q(n-k)
-        num_parts_n_minus_k = number_of_partitions(n-k)
-        #Incremental summation
-        summation = summation + sum_of_odd_divisors(k)*num_parts_n_minus_k
-
-    #Multiplying the sum by 1/n
-    num_parts = summation/n
-
-    #Adding value to lookup table for faster retrieval
-    lookup[n] = num_parts
-
-    return num_parts
-
-#Function to calculate sum of odd divisors
-def sum_of_odd_divisors(k):
-    i = 1
-    sm = 0
-
-    while i <= np.sqrt(k):
-        #If number of divisible by i and i is odd, add i to sum
-        if k % i == 0:
-            if i % 2 == 1:
-                sm = sm+i
-            #Since i is a factor of k, k/i is also a factor of k
-            #If k/i is different from i and it is odd, ass k/i to sum
-            #By adding k/i here, the loop can stop at sqrt(k) and we
-            #need not check for i upto k.
-            if k/i != i and (k/i) % 2 == 1:
-                sm = sm+(k/i)
-
-        i = i+1
-    return sm
+    #A negative number has no partitions
+    if n < 0:
+        return 0
+
+    # Use the precomputed table if one is loaded and covers n
+    if table is not None and 0 <= n <= table.size:
+        return table.distinct_partitions(n)
+
+    return distinct_counts_up_to(n)[n]
+
+
+#Function to return a table of q(0)...q(m) for some m >= n. The largest table filled so far
+#is kept in the lookup cache, so any n it covers is answered without recalculation.
+def distinct_counts_up_to(n):
+    counts = lookup.get("distinct")
+    if counts is None or n >= len(counts):
+        counts = distinct_partition_counts(n)
+        #Adding the table to the lookup cache for faster retrieval
+        lookup.put("distinct", counts)
+    return counts
+
+
+#Function to list the generalized pentagonal numbers k(3k-1)/2 for k = 1, -1, 2, -2, ...
+#up to n, each with its sign (-1)^(k+1) in the recurrence
+def pentagonal_numbers(n):
+    pentagonals = list()
+    k = 1
+    while True:
+        sign = 1 if k % 2 == 1 else -1
+        for pentagonal in (k*(3*k-1)//2, k*(3*k+1)//2):
+            if pentagonal > n:
+                return pentagonals
+            pentagonals.append((pentagonal, sign))
+        k = k+1
+
+
+#Function to fill the table of p(0)...p(n), the number of partitions of every number up to n
+def partition_counts(n):
+    return pentagonal_recurrence(n, dict())
+
+
+#Function to fill the table of q(0)...q(n), the number of partitions into distinct parts
+#of every number up to n
+def distinct_partition_counts(n):
+    #Coefficients of E(x^2): -sign at twice every pentagonal number
+    corrections = dict((2*pentagonal, -sign) for pentagonal, sign in pentagonal_numbers(n))
+    return pentagonal_recurrence(n, corrections)
+
+
+#Function to fill a table bottom-up with the pentagonal number recurrence
+#      c(m) = c(m-1) + c(m-2) - c(m-5) - c(m-7) + ... + corrections(m)
+#starting from c(0) = 1. The table is a numpy array of Python integers, so that each
+#step adds up all of its terms with a single fancy-indexed sum.
+def pentagonal_recurrence(n, corrections):
+    pentagonals = pentagonal_numbers(n)
+    positive = [pentagonal for pentagonal, sign in pentagonals if sign > 0]
+    negative = [pentagonal for pentagonal, sign in pentagonals if sign < 0]
+    positive_offsets = np.array(positive, dtype=np.int64)
+    negative_offsets = np.array(negative, dtype=np.int64)
+
+    counts = np.zeros(n+1, dtype=object)
+    counts[0] = 1
+    for m in range(1, n+1):
+        #Only the pentagonal numbers up to m contribute
+        i = bisect_right(positive, m)
+        j = bisect_right(negative, m)
+        counts[m] = counts[m-positive_offsets[:i]].sum() - counts[m-negative_offsets[:j]].sum() + corrections.get(m, 0)
+    return counts.tolist()
+
+
+#Default for the limits not changed by LRUCache.configure
+UNCHANGED = object()
+
+
+#Bounded, thread-safe memo cache with least recently used eviction. The cache holds at most
+#max_entries values and at most max_bytes bytes of values (as measured by the sizeof function),
+#where None means no limit. Every get counts as a hit or a miss.
+class LRUCache:
+    def __init__(self, max_entries=None, max_bytes=None, sizeof=sys.getsizeof):
+        self.sizeof = sizeof
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_in_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    #Returns the cached value for the key, or None if it is not cached
+    def get(self, key):
+        with self.lock:
+            value = self.entries.pop(key, None)
+            if value is None:
+                self.misses = self.misses + 1
+                return None
+            #Re-insert to mark the entry as most recently used
+            self.entries[key] = value
+            self.hits = self.hits + 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            if key in self.entries:
+                self.size_in_bytes = self.size_in_bytes - self.sizeof(self.entries.pop(key))
+            self.entries[key] = value
+            self.size_in_bytes = self.size_in_bytes + self.sizeof(value)
+            self.evict()
+
+    #Changes the given limits of the cache, evicting entries if it is over the new limits.
+    #A limit that is not given keeps its current value, and None removes it.
+    def configure(self, max_entries=UNCHANGED, max_bytes=UNCHANGED):
+        with self.lock:
+            if max_entries is not UNCHANGED:
+                self.max_entries = max_entries
+            if max_bytes is not UNCHANGED:
+                self.max_bytes = max_bytes
+            self.evict()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size_in_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "entries": len(self.entries), "bytes": self.size_in_bytes}
+
+    #Drops the least recently used entries until the cache is within its limits.
+    #Must be called with the lock held.
+    def evict(self):
+        while self.entries and ((self.max_entries is not None and len(self.entries) > self.max_entries) or
+                                (self.max_bytes is not None and self.size_in_bytes > self.max_bytes)):
+            _, value = self.entries.popitem(last=False)
+            self.size_in_bytes = self.size_in_bytes - self.sizeof(value)
+
+
+#Size of a table of counts, including the integers themselves
+def table_size(counts):
+    return sys.getsizeof(counts) + sum(sys.getsizeof(count) for count in counts)
+
+
+#Global lookup cache holding the largest table of q(0)...q(m) filled so far
+lookup = LRUCache(max_entries=1024, max_bytes=64*2**20, sizeof=table_size)
+
+
+#The partition counts can be precomputed once up to some N and saved to a file, which is
+#then memory-mapped by every worker process. The file starts with a magic string and N,
+#followed by an index of 2(N+1)+1 byte offsets (little-endian unsigned 64 bit integers) and
+#the values themselves, each as little-endian unsigned bytes: first p(0)...p(N), then
+#q(0)...q(N). Reading a value only touches its two offsets and its own bytes, so lookups
+#are O(1) and the pages are shared read-only between processes through the page cache.
+TABLE_MAGIC = b"STAIRS01"
+
+
+#Function to precompute p(n) and q(n) for every n up to size and write them to path
+def write_table(path, size):
+    values = partition_counts(size) + distinct_partition_counts(size)
+    encoded = [value.to_bytes((value.bit_length() + 7)//8, "little") for value in values]
+
+    offsets = [0]
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+
+    with open(path, "wb") as f:
+        f.write(TABLE_MAGIC)
+        f.write(struct.pack("<Q", size))
+        f.write(np.array(offsets, dtype="<u8").tobytes())
+        for data in encoded:
+            f.write(data)
+
+
+#Read-only, memory-mapped view of a table written by write_table
+class PartitionTable:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.buffer[:len(TABLE_MAGIC)] != TABLE_MAGIC:
+            raise ValueError("Not a partition table: %s" % path)
+        header = len(TABLE_MAGIC) + 8
+        self.size = struct.unpack("<Q", self.buffer[len(TABLE_MAGIC):header])[0]
+        count = 2*(self.size + 1) + 1
+        self.offsets = np.frombuffer(self.buffer, dtype="<u8", count=count, offset=header)
+        self.data_start = header + 8*count
+
+    def value(self, i):
+        start = self.data_start + int(self.offsets[i])
+        end = self.data_start + int(self.offsets[i+1])
+        return int.from_bytes(self.buffer[start:end], "little")
+
+    #Number of partitions p(n)
+    def partitions(self, n):
+        return self.value(n)
+
+    #Number of partitions into distinct parts q(n)
+    def distinct_partitions(self, n):
+        return self.value(self.size + 1 + n)
+
+
+#Global precomputed table, used by number_of_partitions when it covers n
+table = None
+
+
+#Function to memory-map a table written by write_table and use it for all later calls
+def load_table(path):
+    global table
+    table = PartitionTable(path)
+    return table
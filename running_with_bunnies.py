@@ -14,166 +14,462 @@
 # and thus reach all the bunnies. Hence, the solution is all bunnies.
 
 # If the graph does not have a negative cycle, we take the following approach.
-# We find all possible paths in the graph with only 2 vertices, 3 vertices etc.,
-# up to the paths with all vertices. For each of these paths, we calculate the
+# We find all possible paths in the graph through 1 bunny, 2 bunnies etc.,
+# up to the paths through all bunnies. For each of these paths, we calculate the
 # the time taken (cumulative weight), and we consider the path as valid only if
 # time taken is less than the time limit. As our goal is to maximize the number
-# of bunnies, as we increment the number of vertices, we consider the possible
-# paths for the maximum number of vertices where weight is less than the time limit.
-# If there are multiple such max. vertices paths, we sort them to return the one
-# starting with the lowest bunny. To get all possible n vertex paths efficiently,
-# we use the logic that every n-vertex path whose weight "could" be lesser than max time,
-# can be represented as the sum of an (n-1)-vertex path whose weight is definitely
-# lesser than max time, and an additional vertex. Hence, we can recursively calculate
-# n-vertex paths by caching the valid (n-1)-vertex paths and their weights, and combining
-# them with every other additional vertex possible and adding shortest time to reach
-# that vertex.
+# of bunnies, as we increment the number of bunnies, we consider the possible
+# paths for the maximum number of bunnies where weight is less than the time limit.
+# If there are multiple such sets of bunnies, we return the one starting with the
+# lowest bunny. A path is only ever extended at its end, so all we need to know
+# about a path is the set of bunnies it visited and the bunny it ended at. This is
+# the state of our dynamic programming: for every (set, last bunny) we keep the
+# shortest time taken to start from the start, visit the set and end at the last
+# bunny. The set is stored as a bitmask with bit b set for bunny b, and the states
+# for all sets of a given size are kept in flat arrays, one row per last bunny and
+# one column per set. The states with one more bunny are computed from these,
+# for every last bunny at once, by adding the shortest time to reach the new bunny.
+# Since there are no negative cycles, the shortest times satisfy the triangle
+# inequality: going to the bulkhead through another bunny never takes less time
+# than going there directly. Hence a path which can't reach the bulkhead in time
+# can't be extended into one that can, and we drop such states right away.
 #
-# We get the shortest time to reach the vertex using the Bellman-Ford
-# algorithm. This algorithm iterates over all edges and "relaxes" an edge
-# if it decreases the distance from start to the second point of the edge, i.e. update
-# the shortest distance to the second point of the edge. We do this iteratively
-# over all edges n times, where n is number of vertices - 1. This ensures
-# all vertices are accounted for in finding the shortest distance (the -1 is because
-# an edge has 2 vertices and thus last vertex is accounted for by virtue of counting the
-# edges of the rest). We use the Bellman-Ford algorithm as opposed to other algorithms
-# here as this algorithm also provides the flexibility of detecting negative weight
-# cycles. When we iterate over the edges for all vertices, when optimal distances
-# for all vertices are reached, no edges are relaxed in the next iteration. After
-# all the iterations, if no such optimal solution is reached and edge relaxation
-# is still possible (i.e. possible to calculate a shorter distance), then
-# a negative cycle is detected in the graph which can potentially endlessly reduce
-# the distance. This is useful for the trivial case mentioned above.
-
-
-def solution(matrix, max_time):
-
-    # This function implements the Bellman Ford Algorithm to return
-    # the shortest distance to every vertex in the graph, given a source
-    # vertex (starting vertex). It also returns a boolean for whether
-    # a negative cycle is detected in the graph.
-    def bellman_ford(start):
-        # Initialize distance to all vertices from start as infinity.
-        distances = [float('inf')]*len(matrix)
-
-        # Distance of start to itself is 0.
-        distances[start] = 0
-
-        for i in range(len(matrix) - 1):
-            num_edges_relaxed = 0
-            for x, y, distance in edges:
-                if distances[x] + distance < distances[y]:
-                    num_edges_relaxed += 1
-                    distances[y] = distances[x] + distance
-
-            # If the number of edges relaxed in this iteration is 0,
-            # we can terminate the loop prematurely as no vertex was updated
-            # and all distances are optimal.
-            if num_edges_relaxed == 0:
-                break
-
-        return distances, True if num_edges_relaxed > 0 else False
-
-    # Get list of edges for the given matrix in graph form.
-    # Each edge is a tuple of first vertex, second vertex and distance - (x,y,distance)
-    def get_edges():
-        edges = []
-        for x, row in enumerate(matrix):
-            for y, distance in enumerate(row):
-                edges.append([x, y, distance])
-        return edges
-
-
-    # This function recursively gets all possible paths with number
-    # of vertices n.
-    def generate_all_paths(n):
-        # If n is 1, return the sorted list of vertices.
-        if n == 1:
-            return sorted(bunny_vertices)
-        else:
-            # Construct all n-paths using the cached (n-1)-paths.
-            paths = list()
-            valid_path_keys = valid_paths.keys()
-            for path in valid_path_keys:
-                for index in bunny_vertices:
-                    # A vertex can only appear once in a path.
-                    if index in path:
-                        continue
-                    current_path = path + index
-                    if current_path[1:] in valid_path_keys:
-                        paths.append(current_path)
-            return paths
-
-    # Cache to hold the valid paths
-    valid_paths = dict()
-
-    # Generate the list of bunny IDs from the matrix.
-    bunny_vertices = [str(bunny + 1) for bunny in range(len(matrix) - 2)]
-
-    # Generate the list of edges from the graph.
-    edges = get_edges()
-
-    # Use the Bellman-Ford implementation to test for negative
+# We get the shortest time between every pair of vertices using the Floyd-Warshall
+# algorithm. For every vertex k in turn, it checks whether going through k shortens
+# the path between any pair of vertices i and j, i.e. whether
+# time(i, k) + time(k, j) < time(i, j), and if so updates the shortest time. After all
+# vertices have been considered as the intermediate vertex k, every entry holds the
+# shortest time between the pair. All pairs are updated at once for a given k, as the
+# sum of the k-th column and the k-th row of the matrix, so each step is a single
+# vectorized operation over the whole matrix. Floyd-Warshall also detects negative
+# weight cycles exactly: the shortest time from a vertex back to itself starts at 0, and
+# it only drops below 0 if the vertex is on a cycle whose total weight is negative.
+# This is useful for the trivial case mentioned above. We stop as soon as such a
+# cycle shows up, since the times around it keep decreasing with every further step.
+
+
+from itertools import combinations
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+
+def solution(matrix, max_time, method="dp", workers=None):
+    # Use the Floyd-Warshall implementation to test for negative
     # cycles and compute the shortest times from every vertex
     # to every other vertex.
-    shortest_time_matrix = []
-    negative_cycle = False
-    for vertex in range(len(matrix)):
-        distances, negative_cycle = bellman_ford(vertex)
-        shortest_time_matrix.append(distances)
+    shortest_time_matrix, negative_cycle = floyd_warshall(matrix)
 
     # If there is a negative cycle, all bunnies can be rescued.
-    if negative_cycle > 0:
-        return range(len(matrix) - 2)
+    if negative_cycle:
+        return list(range(len(matrix) - 2))
 
-    # Set the start and end vertices.
-    start = 0
-    end = len(matrix) - 1
+    if method == "dp":
+        # Spread every step of the search over a process pool
+        if workers is not None and workers > 1:
+            return parallel_rescue(shortest_time_matrix, max_time, workers)
+        return rescue_bunnies(shortest_time_matrix, max_time)
+    if method == "bound":
+        return bound_rescue(shortest_time_matrix, max_time)
+    raise ValueError("Unknown method: %s" % method)
 
-    # Iterate over all possible path lengths.
-    for path_length in range(1, len(bunny_vertices) + 1):
-        valid_paths_new = {}
 
-        # Generate all possible paths for the current number of vertices.
-        paths = generate_all_paths(path_length)
+# Large enough to mark a state as unreachable, yet small enough that
+# adding a shortest time to it doesn't overflow.
+UNREACHABLE = np.iinfo(np.int64).max // 4
 
-        # If there are no valid paths for the current length, there will be no
-        # further valid paths of greater length either. Hence we can end the loop.
-        if len(paths) <= 0:
-            break
 
-        # Test every path to see if it is still within the time limit. We do
-        # this by using the cached weight of the sub path and adding the shortest
-        # time to reach the additional vertex (pre-computed from the Bellman-Ford).
-        for path in paths:
-            if len(path) >= 2:
-                sub_path = path[:-1]
-                sub_path_time = valid_paths[sub_path]
-                path_time = sub_path_time - \
-                            shortest_time_matrix[int(sub_path[-1])][end] + \
-                            shortest_time_matrix[int(sub_path[-1])][int(path[-1])] + \
-                            shortest_time_matrix[int(path[-1])][end]
-            else:
-                path_time = shortest_time_matrix[start][int(path[0])] + \
-                            shortest_time_matrix[int(path[0])][end]
-
-            if path_time <= max_time:
-                valid_paths_new[path] = path_time
-
-        # If there are no valid paths for the current length, there will be no
-        # further valid paths of greater length either. Hence we can end the loop.
-        if len(valid_paths_new) <= 0:
+# This function runs the dynamic programming over (set, last bunny) states
+# and returns the lowest maximal set of bunnies which can be rescued within
+# the time limit, as a list of bunny IDs. The onward times of every step are
+# computed by the given function, in this process by default.
+def rescue_bunnies(shortest_time_matrix, max_time, onward=None):
+    bunnies = len(shortest_time_matrix) - 2
+
+    # If we can't even reach the bulkhead directly, no bunny can be rescued.
+    if shortest_time_matrix[0][-1] > max_time:
+        return []
+    rescued = 0
+
+    for masks, _ in path_layers(shortest_time_matrix, max_time, onward):
+        rescued = lowest_set(masks, bunnies)
+
+    return bunny_ids(rescued, bunnies)
+
+
+# This function yields, for every number of bunnies from 1 up, the sorted
+# masks of the sets of that many bunnies with a path within the time limit,
+# along with the shortest time of a path through each set. Without a time
+# limit, every set of bunnies is yielded.
+def path_layers(shortest_time_matrix, max_time=None, onward=None):
+    if onward is None:
+        onward = onward_times
+    times = np.array(shortest_time_matrix, dtype=np.int64)
+
+    # Set the start and end vertices. Bunny b is the vertex b + 1.
+    start = 0
+    end = len(times) - 1
+    bunnies = end - 1
+    between_bunnies = times[1:end, 1:end]
+    to_end = times[1:end, end, np.newaxis]
+    bits = np.left_shift(1, np.arange(bunnies, dtype=np.int64))
+
+    # The states for paths through a single bunny.
+    masks = bits
+    elapsed = np.full((bunnies, bunnies), UNREACHABLE, dtype=np.int64)
+    elapsed[np.arange(bunnies), np.arange(bunnies)] = times[start, 1:end]
+
+    while len(masks):
+        # Drop the states which can't reach the bulkhead in time, and the
+        # sets left without any state.
+        finish = np.where(elapsed < UNREACHABLE, elapsed + to_end, UNREACHABLE)
+        if max_time is not None:
+            finish[finish > max_time] = UNREACHABLE
+            elapsed[finish == UNREACHABLE] = UNREACHABLE
+        valid = (elapsed < UNREACHABLE).any(axis=0)
+        masks = masks[valid]
+        elapsed = elapsed[:, valid]
+        if not len(masks):
             break
+        yield masks, finish[:, valid].min(axis=0)
+
+        masks, elapsed = extend_paths(masks, onward(elapsed, between_bunnies), bits)
+
+
+# This function returns the shortest time to go on from every set to every
+# bunny j, given the times of the states of the sets. That is the shortest,
+# over every last bunny i of the set, of the time of the state plus the
+# shortest time from i to j, computed one i at a time.
+def onward_times(elapsed, between_bunnies):
+    onward = np.full(elapsed.shape, UNREACHABLE, dtype=np.int64)
+    through = np.empty(elapsed.shape, dtype=np.int64)
+    for i in range(len(elapsed)):
+        np.add(elapsed[i], between_bunnies[i, :, np.newaxis], out=through)
+        np.minimum(onward, through, out=onward)
+    return np.minimum(onward, UNREACHABLE, out=onward)
+
+
+# This function extends every path by one more bunny. Given the sorted masks
+# of the sets of one size and their onward times, it returns the sorted masks
+# of the sets with one more bunny and the times of their states. The time to
+# end a set at bunny j is the onward time to j of the set without j.
+def extend_paths(masks, onward, bits):
+    # Flat lookup from a mask to its column, -1 for the sets without one.
+    columns = np.full(2*bits[-1], -1, dtype=np.int64)
+    columns[masks] = np.arange(len(masks))
+
+    # Mark every set reachable by adding a bunny to a valid set.
+    extended = np.zeros(len(columns), dtype=bool)
+    extended[(masks[:, np.newaxis] | bits).ravel()] = True
+    extended[masks] = False
+    extended = np.flatnonzero(extended)
+
+    new_elapsed = np.full((len(bits), len(extended)), UNREACHABLE, dtype=np.int64)
+    for j, bit in enumerate(bits):
+        # Find the column of the set without bunny j, if it is still valid.
+        previous = columns[extended ^ bit]
+        found = ((extended & bit) != 0) & (previous >= 0)
+        new_elapsed[j, found] = onward[j, previous[found]]
+
+    return extended, new_elapsed
+
+
+# Parallel version of the dynamic programming. The onward times of every step
+# are split into ranges of sets, which are computed by the workers of a process
+# pool. The shortest time matrix is shared with the workers once, through shared
+# memory, and the times of the states of every step are handed over in shared
+# memory too, with every worker writing the onward times of its own range of
+# sets in place. Since the onward times are exact, the result is the same as
+# the serial one.
+def parallel_rescue(shortest_time_matrix, max_time, workers):
+    times = np.array(shortest_time_matrix, dtype=np.int64)
+    shared = SharedMemory(create=True, size=max(times.nbytes, 1))
+    try:
+        np.ndarray(times.shape, dtype=np.int64, buffer=shared.buf)[:] = times
+        with Pool(workers, initializer=attach_times, initargs=(shared.name, times.shape)) as pool:
+            def onward(elapsed, between_bunnies):
+                return pool_onward_times(pool, workers, elapsed, between_bunnies)
+            return rescue_bunnies(shortest_time_matrix, max_time, onward)
+    finally:
+        shared.close()
+        shared.unlink()
+
+
+# Onward times of a step, computed over the process pool. Small steps aren't
+# worth handing over, and are computed right here.
+def pool_onward_times(pool, workers, elapsed, between_bunnies, tasks_per_worker=4, smallest_range=4096):
+    sets = elapsed.shape[1]
+    if sets < 2*smallest_range:
+        return onward_times(elapsed, between_bunnies)
+
+    shared = SharedMemory(create=True, size=2*elapsed.nbytes)
+    try:
+        arrays = np.ndarray((2,) + elapsed.shape, dtype=np.int64, buffer=shared.buf)
+        arrays[0] = elapsed
+        bounds = np.linspace(0, sets, min(workers*tasks_per_worker, sets // smallest_range) + 1).astype(int)
+        pool.map(range_onward_times, [(shared.name, elapsed.shape, bounds[k], bounds[k + 1])
+                                      for k in range(len(bounds) - 1)])
+        onward = arrays[1].copy()
+        del arrays
+        return onward
+    finally:
+        shared.close()
+        shared.unlink()
+
+
+# The shortest times between bunnies in the workers, read out of the shared
+# shortest time matrix by attach_times when the worker starts.
+pool_between_bunnies = None
+
+
+def attach_times(name, shape):
+    global pool_between_bunnies
+    shared = SharedMemory(name=name)
+    times = np.ndarray(shape, dtype=np.int64, buffer=shared.buf)
+    pool_between_bunnies = times[1:-1, 1:-1].copy()
+    del times
+    shared.close()
+
+
+# Worker side of pool_onward_times. Computes the onward times of the sets in
+# the given range, reading the times of their states from the shared memory
+# and writing the onward times right after them.
+def range_onward_times(task):
+    name, shape, first, last = task
+    shared = SharedMemory(name=name)
+    arrays = np.ndarray((2,) + shape, dtype=np.int64, buffer=shared.buf)
+    arrays[1, :, first:last] = onward_times(arrays[0, :, first:last], pool_between_bunnies)
+    del arrays
+    shared.close()
+
+
+# Among sets of the same size, the lowest set is the one holding the lowest
+# bunny that isn't in both. Reversing the bits of the masks, that is the
+# bunny with the highest bit, so the lowest set has the largest reversed mask.
+def lowest_set(masks, bunnies):
+    return int(masks[np.argmax(reversed_bits(masks, bunnies))])
+
+
+def reversed_bits(masks, bunnies):
+    reversed_masks = np.zeros(len(masks), dtype=np.int64)
+    for bunny in range(bunnies):
+        reversed_masks |= ((masks >> bunny) & 1) << (bunnies - 1 - bunny)
+    return reversed_masks
+
+
+# The list of bunny IDs in the set with the given mask.
+def bunny_ids(mask, bunnies):
+    return [bunny for bunny in range(bunnies) if mask & (1 << bunny)]
+
+
+# Branch-and-bound version of the search. As we only need the largest set of
+# bunnies, we try the sets of bunnies themselves, largest first and in
+# lexicographic order within a size, and stop at the first set for which some
+# path is within the time limit. Most of the time that is one of the first few
+# sets tried. Before searching the paths through a set, we check a lower bound
+# on the time of any such path: the path enters every bunny of the set and the
+# bulkhead exactly once, each time from the start or another bunny of the set,
+# so it takes at least the sum of the shortest such entries. Any set holding a
+# bunny which can't be rescued on its own, or a pair of bunnies which can't be
+# rescued together, is skipped too, since removing bunnies from a path never
+# makes it slower. The sets are generated with these checks applied to every
+# partial set, so whole branches of hopeless sets are never generated at all.
+def bound_rescue(shortest_time_matrix, max_time):
+    times = shortest_time_matrix
+    start = 0
+    end = len(times) - 1
+
+    # If we can't even reach the bulkhead directly, no bunny can be rescued.
+    if times[start][end] > max_time:
+        return []
+
+    bunnies = [bunny for bunny in range(1, end) if path_time(times, [bunny]) <= max_time]
+    conflicts = set()
+    for a, b in combinations(bunnies, 2):
+        if min(path_time(times, [a, b]), path_time(times, [b, a])) > max_time:
+            conflicts.add((a, b))
+
+    # The cheapest entry into every bunny, from the start or any other bunny,
+    # and the time left for the entries once the bulkhead is entered.
+    entries = [min(times[other][bunny] for other in [start] + bunnies if other != bunny)
+               for bunny in bunnies]
+    budget = max_time - min([times[bunny][end] for bunny in bunnies] + [times[start][end]])
+
+    for size in range(len(bunnies), 0, -1):
+        for subset in candidate_sets(bunnies, size, entries, conflicts, budget):
+            if lower_bound(times, subset) > max_time:
+                continue
+            if feasible_path(times, subset, max_time):
+                return [bunny - 1 for bunny in subset]
+    return []
+
+
+# This function generates the sets of bunnies of the given size in
+# lexicographic order, skipping whole branches of sets which hold a pair of
+# conflicting bunnies, or whose cheapest entries already exceed the budget.
+def candidate_sets(bunnies, size, entries, conflicts, budget):
+    # cheapest[index][k] is the sum of the k cheapest entries from index on.
+    cheapest = []
+    for index in range(len(bunnies) + 1):
+        sums = [0]
+        for entry in sorted(entries[index:]):
+            sums.append(sums[-1] + entry)
+        cheapest.append(sums)
+
+    def extend(chosen, first, spent):
+        needed = size - len(chosen)
+        if needed == 0:
+            yield tuple(chosen)
+            return
+        for index in range(first, len(bunnies) - needed + 1):
+            bunny = bunnies[index]
+            current = spent + entries[index]
+            if current + cheapest[index + 1][needed - 1] > budget:
+                continue
+            if any((other, bunny) in conflicts for other in chosen):
+                continue
+            chosen.append(bunny)
+            for subset in extend(chosen, index + 1, current):
+                yield subset
+            chosen.pop()
+
+    return extend([], 0, 0)
+
+
+# The time taken by the path from the start, through the given vertices in
+# order, to the bulkhead.
+def path_time(times, vertices):
+    path = [0] + list(vertices) + [len(times) - 1]
+    return sum(times[path[i]][path[i + 1]] for i in range(len(path) - 1))
+
+
+# Lower bound on the time of any path from the start through all of the
+# given bunny vertices to the bulkhead, as the sum over every vertex entered
+# of the shortest time to enter it from a vertex that may come before it.
+def lower_bound(times, subset):
+    end = len(times) - 1
+    bound = min(times[bunny][end] for bunny in subset)
+    for bunny in subset:
+        bound += min(times[other][bunny] for other in (0,) + subset if other != bunny)
+    return bound
+
+
+# Depth first search over the orders in which the given bunny vertices can be
+# visited, returning as soon as one is within the time limit. A partial path
+# is abandoned if the shortest entries into its remaining bunnies and the
+# bulkhead already take it over the time limit, or if another partial path
+# reached the same last bunny with the same remaining bunnies in less time.
+def feasible_path(times, subset, max_time):
+    end = len(times) - 1
+    entries = dict((bunny, min(times[other][bunny] for other in (0,) + subset if other != bunny))
+                   for bunny in subset)
+    fastest = dict()
+
+    def visit(last, remaining, elapsed, ahead):
+        if not remaining:
+            return elapsed + times[last][end] <= max_time
+        for bunny in remaining:
+            current = elapsed + times[last][bunny]
+            rest_ahead = ahead - entries[bunny]
+            if current + max(rest_ahead + exits, times[bunny][end]) > max_time:
+                continue
+            rest = remaining - {bunny}
+            key = (rest, bunny)
+            if key in fastest and fastest[key] <= current:
+                continue
+            fastest[key] = current
+            if visit(bunny, rest, current, rest_ahead):
+                return True
+        return False
+
+    exits = min(times[bunny][end] for bunny in subset)
+    return visit(0, frozenset(subset), 0, sum(entries.values()))
+
+
+# This function implements the Floyd-Warshall Algorithm to return the
+# shortest time from every vertex to every other vertex in the graph, as
+# a list of rows. It also returns a boolean for whether a negative cycle
+# is detected in the graph.
+def floyd_warshall(matrix):
+    times = np.array(matrix, dtype=np.int64)
+
+    # The time from a vertex to itself is 0, unless the vertex has a
+    # negative edge to itself, which is a negative cycle on its own.
+    diagonal = np.arange(len(matrix))
+    times[diagonal, diagonal] = np.minimum(times[diagonal, diagonal], 0)
+
+    for k in range(len(matrix)):
+        # Relax every pair (i, j) through the vertex k at once.
+        np.minimum(times, times[:, k, np.newaxis] + times[np.newaxis, k, :], out=times)
+
+        # A negative time from a vertex to itself means a negative cycle.
+        if np.any(times[diagonal, diagonal] < 0):
+            return times.tolist(), True
+
+    return times.tolist(), False
+
+
+# Solver for repeated queries on the same corridor graph. It keeps the
+# shortest time matrix between queries, so that changing the time of a single
+# edge doesn't need the whole Floyd-Warshall again, and it keeps the shortest
+# time through every set of bunnies, so that any time limit is answered from
+# the same table.
+class CorridorSolver:
+    def __init__(self, matrix):
+        self.matrix = [list(row) for row in matrix]
+        times, self.negative_cycle = floyd_warshall(self.matrix)
+        self.times = np.array(times, dtype=np.int64)
+        self.table = None
+
+    # Change the time of the edge from source to target. If the time drops,
+    # the only new shortest paths are the ones through this edge, so every
+    # pair (i, j) is relaxed through it at once, in O(V^2). If the time goes
+    # up, nothing changes unless the edge was the shortest path from source to
+    # target itself, or the edge may have been on a negative cycle, in which
+    # case the shortest times are computed again.
+    def update_edge(self, source, target, time):
+        previous = self.matrix[source][target]
+        self.matrix[source][target] = time
+        self.table = None
+
+        if time > previous and (self.negative_cycle or previous <= self.times[source, target]):
+            times, self.negative_cycle = floyd_warshall(self.matrix)
+            self.times = np.array(times, dtype=np.int64)
+            return
+        if self.negative_cycle or time >= self.times[source, target]:
+            return
+
+        through = self.times[:, source, np.newaxis] + time + self.times[np.newaxis, target, :]
+        np.minimum(self.times, through, out=self.times)
+        self.negative_cycle = bool(np.any(np.diagonal(self.times) < 0))
+
+    def solution(self, max_time):
+        return self.solution_many([max_time])[0]
 
-        # Replace the cached paths with the newly computed paths. We only
-        # need to cache the results of 1 previous iteration as we are working
-        # towards path with maximum vertices and we don't need anything other
-        # than 1 iteration prior, to do so.
-        valid_paths = valid_paths_new
+    # Answers a sweep of time limits. For every number of bunnies, the sets
+    # are ordered from the lowest set up, along with the running minimum of
+    # their shortest times, which never goes up. The lowest set within a time
+    # limit is then the first one whose running minimum is within the limit.
+    def solution_many(self, max_times):
+        bunnies = len(self.matrix) - 2
+        if self.negative_cycle:
+            return [list(range(bunnies)) for _ in max_times]
 
-    # Sort the final paths with maximum number of vertices to get the path starting
-    # with minimum ID bunny.
-    sorted_paths = sorted([sorted(path) for path in valid_paths.keys()])
+        if self.table is None:
+            self.table = []
+            for masks, finish in path_layers(self.times):
+                order = np.argsort(-reversed_bits(masks, bunnies), kind="stable")
+                self.table.append((masks[order], np.minimum.accumulate(finish[order])))
 
-    # The first element of the array is our final answer.
-    return [int(a) - 1 for a in sorted_paths[0]]
\ No newline at end of file
+        results = []
+        for max_time in max_times:
+            rescued = []
+            if self.times[0, -1] <= max_time:
+                for masks, fastest in reversed(self.table):
+                    if fastest[-1] <= max_time:
+                        first = np.searchsorted(-fastest, -max_time)
+                        rescued = bunny_ids(int(masks[first]), bunnies)
+                        break
+            results.append(rescued)
+        return results
@@ -1,14 +1,29 @@
-import numpy as np
+try:
+    from math import isqrt
+except ImportError:
+    def isqrt(num):
+        if num == 0:
+            return 0
+        # Newton's method on integers, starting above the root and decreasing to it
+        root = 1 << ((num.bit_length() + 1)//2)
+        while True:
+            next_root = (root + num//root)//2
+            if next_root >= root:
+                return root
+            root = next_root
 
 def solution(num):
     remainder = num
     squares = list()
     while remainder > 0:
         nearest_square, remainder = nearest_smaller_square(remainder)
-        squares.append(np.square(nearest_square))
+        squares.append(nearest_square*nearest_square)
     return squares
 
+def solution_many(nums):
+    return [solution(int(num)) for num in nums]
+
 def nearest_smaller_square(num):
-    nearest_square = np.int(np.floor(np.sqrt(num)))
-    remainder = num - np.square(nearest_square)
+    nearest_square = isqrt(num)
+    remainder = num - nearest_square*nearest_square
     return nearest_square, remainder